@@ -1,13 +1,29 @@
+import io
 import os
+import mimetypes
+import unicodedata
+from urllib.parse import quote
 import logging
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, send_file, jsonify, g
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import json
 import shutil
+import time
+import uuid
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from tableau_api import TableauAPI
-from image_processor import ImageProcessor
+from tableau_api import TableauAPI, scheduler_stats, token_expiring
+from metadata_cache import metadata_cache
+from export_cache import ExportCache
+from crop_templates import CropTemplateStore
+from image_processor import ImageProcessor, RASTER_DPI, OUTPUT_PROFILES, DEFAULT_OUTPUT_PROFILE
+from rasterizers import get_rasterizer
+from artifact_store import artifact_store, VARIANT_FORMATS
+from session_store import create_session_interface
+from jobs import JobQueue, FINISHED
+import instrumentation
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,6 +40,71 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Export mode: 'pdf' rasterizes Tableau's PDF locally, 'image' uses the server-rendered PNG
+app.config['EXPORT_MODE'] = os.environ.get('EXPORT_MODE', 'pdf')
+app.config['IMAGE_RESOLUTION'] = os.environ.get('IMAGE_RESOLUTION', 'high')
+# Pixels per inch of server-rendered PNGs ('high' renders at twice the 96 DPI layout), used to
+# place them at their physical size in reports; PDF exports are rasterized at RASTER_DPI
+app.config['IMAGE_DPI'] = float(os.environ.get('IMAGE_DPI', '192' if app.config['IMAGE_RESOLUTION'] == 'high' else '96'))
+# Crop mode: 'raster' crops the PNG, 'vector' also crops the exported PDF page for vector PDF reports
+app.config['CROP_MODE'] = os.environ.get('CROP_MODE', 'raster')
+# Auto-crop after export: 'off', 'propose' (preselect the detected box in the crop UI) or 'apply'
+app.config['AUTO_CROP'] = os.environ.get('AUTO_CROP', 'off')
+
+# On-disk cache of exported PDFs/PNGs keyed by view id, options and updatedAt
+export_cache = ExportCache(
+    os.environ.get('EXPORT_CACHE_DIR', os.path.join(OUTPUT_FOLDER, 'cache')),
+    max_bytes=int(os.environ.get('EXPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+    max_age=float(os.environ.get('EXPORT_CACHE_MAX_AGE', '3600'))
+)
+
+# Crop rectangles saved per view id and re-applied when the view is exported again
+crop_templates = CropTemplateStore(
+    os.environ.get('CROP_TEMPLATES_PATH', os.path.join(OUTPUT_FOLDER, 'crop_templates.json'))
+)
+
+# Workflow state (tokens and one slot per dashboard) is kept server-side; the cookie only
+# carries a signed session id. 'sqlite' is shared by all workers on a host, 'memory' is
+# per process, 'cookie' keeps Flask's signed cookie session (about 4 KB in total)
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite')
+session_interface = create_session_interface(
+    app.config['SESSION_BACKEND'],
+    os.environ.get('SESSION_DB_PATH', os.path.join(OUTPUT_FOLDER, 'sessions.sqlite3'))
+)
+if session_interface:
+    app.session_interface = session_interface
+app.config['MAX_WORKBOOKS'] = int(os.environ.get('MAX_WORKBOOKS', '50' if session_interface else '3'))
+
+# Bounded worker pools for batch exports: REST downloads and PDF rasterization
+app.config['EXPORT_CONCURRENCY'] = int(os.environ.get('EXPORT_CONCURRENCY', '4'))
+app.config['RASTERIZE_CONCURRENCY'] = int(os.environ.get('RASTERIZE_CONCURRENCY', str(os.cpu_count() or 2)))
+export_pool = ThreadPoolExecutor(max_workers=app.config['EXPORT_CONCURRENCY'], thread_name_prefix='export')
+rasterize_pool = ThreadPoolExecutor(max_workers=app.config['RASTERIZE_CONCURRENCY'], thread_name_prefix='rasterize')
+
+def remove_job_output(kind, result):
+    """Delete the report file of an expired combine job"""
+    if kind == 'combine' and result.get('output_path'):
+        try:
+            os.remove(result['output_path'])
+        except FileNotFoundError:
+            pass
+
+# Background jobs for exports and report assembly, so web threads only serve quick requests.
+# Finished jobs, and the reports combine jobs wrote, are kept for JOB_MAX_AGE seconds
+job_queue = JobQueue(
+    os.environ.get('JOB_DB_PATH', os.path.join(OUTPUT_FOLDER, 'jobs.sqlite3')),
+    workers=int(os.environ.get('JOB_WORKERS', '2')),
+    max_age=float(os.environ.get('JOB_MAX_AGE', str(24 * 3600))),
+    on_expire=remove_job_output
+)
+
+# Progress stream: how often to check for new job events, and the idle comment
+# interval that keeps proxies from closing a quiet connection
+JOB_EVENTS_POLL_SECONDS = float(os.environ.get('JOB_EVENTS_POLL_SECONDS', '0.25'))
+JOB_EVENTS_KEEPALIVE_SECONDS = float(os.environ.get('JOB_EVENTS_KEEPALIVE_SECONDS', '15'))
+# How long one event stream holds a server thread before the client is asked to reconnect
+JOB_EVENTS_STREAM_SECONDS = float(os.environ.get('JOB_EVENTS_STREAM_SECONDS', '25'))
+
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
@@ -31,11 +112,61 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def tableau_credentials():
+    """The signed-in user's Tableau connection details, for clients built outside a request"""
+    return {key: session.get(key) for key in ('tableau_server', 'tableau_site', 'username', 'tableau_token',
+                                              'tableau_site_id', 'tableau_user_id', 'tableau_token_issued_at')}
+
+def client_from_credentials(credentials):
+    """Build a TableauAPI client that shares the process-wide connection pool.
+
+    The client uses the session's own token; an expired or rejected token means
+    signing in again through the login page."""
+    tableau = TableauAPI(credentials['tableau_server'], credentials['tableau_site'])
+    tableau.resume(credentials.get('username'), credentials['tableau_token'], credentials['tableau_site_id'],
+                   credentials['tableau_user_id'], credentials.get('tableau_token_issued_at'))
+    return tableau
+
+def get_tableau_client():
+    """Build a TableauAPI client from the session; a token Tableau rejects during
+    the request ends the sign-in after it."""
+    tableau = client_from_credentials(tableau_credentials())
+    g.tableau = tableau
+    return tableau
+
+@app.before_request
+def require_current_sign_in():
+    """Send users back through the login page shortly before their Tableau token expires;
+    passwords are not kept, so the app cannot sign in again on their behalf"""
+    if request.endpoint in ('login', 'static') or 'tableau_token' not in session:
+        return None
+    if not token_expiring(session.get('tableau_token_issued_at')):
+        return None
+    return sign_in_again()
+
+@app.after_request
+def end_rejected_sign_in(response):
+    """Turn a request whose Tableau token was rejected (401) into a sign-in prompt"""
+    tableau = g.pop('tableau', None)
+    # A client that signed out (logout) has no sign-in left to end
+    if tableau is None or tableau.token is None or not tableau.token_rejected:
+        return response
+    response.close()
+    return app.make_response(sign_in_again())
+
+def sign_in_again():
+    """Drop the sign-in and send the user to the login page (HTML) or answer 401 (API)"""
+    session.clear()
+    if 'text/html' in request.headers.get('Accept', ''):
+        flash('Your Tableau session has expired. Please log in again.', 'info')
+        return redirect(url_for('login'))
+    return jsonify({'error': 'Not authenticated'}), 401
+
 @app.route('/')
 def index():
     if 'tableau_token' not in session:
         return redirect(url_for('login'))
-    return render_template('index.html')
+    return render_template('index.html', max_workbooks=app.config['MAX_WORKBOOKS'])
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -49,12 +180,17 @@ def login():
             tableau = TableauAPI(server_url, site_id)
             token, site_id_response, user_id = tableau.authenticate(username, password)
             
+            # Never carry a pre-login session id into the authenticated session
+            if hasattr(session, 'regenerate'):
+                session.regenerate()
+            
             # Store authentication info in session
             session['tableau_token'] = token
             session['tableau_site_id'] = site_id_response
             session['tableau_user_id'] = user_id
             session['tableau_server'] = server_url
             session['tableau_site'] = site_id
+            session['tableau_token_issued_at'] = tableau.token_issued_at
             session['username'] = username
             
             flash('Successfully logged in to Tableau!', 'success')
@@ -68,13 +204,16 @@ def login():
 
 @app.route('/logout')
 def logout():
+    if 'tableau_token' in session:
+        # Invalidate this session's own token; no other session holds it
+        get_tableau_client().sign_out()
     session.clear()
     flash('Logged out successfully', 'info')
     return redirect(url_for('login'))
 
 @app.route('/set_workbook_count', methods=['POST'])
 def set_workbook_count():
-    count = int(request.form.get('count', 2))
+    count = min(max(int(request.form.get('count', 2)), 1), app.config['MAX_WORKBOOKS'])
     session['workbook_count'] = count
     session['workbooks'] = []
     session['cropped_images'] = {}
@@ -98,10 +237,7 @@ def get_projects():
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        tableau = TableauAPI(session['tableau_server'], session['tableau_site'])
-        tableau.token = session['tableau_token']
-        tableau.site_id_response = session['tableau_site_id']
-        tableau.user_id = session['tableau_user_id']
+        tableau = get_tableau_client()
         
         projects = tableau.get_projects()
         return jsonify({'projects': projects})
@@ -115,10 +251,7 @@ def get_workbooks(project_name):
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        tableau = TableauAPI(session['tableau_server'], session['tableau_site'])
-        tableau.token = session['tableau_token']
-        tableau.site_id_response = session['tableau_site_id']
-        tableau.user_id = session['tableau_user_id']
+        tableau = get_tableau_client()
         
         workbooks = tableau.list_workbooks_in_project(project_name)
         return jsonify({'workbooks': workbooks})
@@ -132,10 +265,7 @@ def get_dashboards(workbook_id):
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
-        tableau = TableauAPI(session['tableau_server'], session['tableau_site'])
-        tableau.token = session['tableau_token']
-        tableau.site_id_response = session['tableau_site_id']
-        tableau.user_id = session['tableau_user_id']
+        tableau = get_tableau_client()
         
         dashboards = tableau.get_views_in_workbook(workbook_id)
         return jsonify({'dashboards': dashboards})
@@ -143,6 +273,180 @@ def get_dashboards(workbook_id):
         logging.error(f"Error getting dashboards: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/refresh_metadata', methods=['POST'])
+def refresh_metadata():
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    resource = (request.get_json(silent=True) or {}).get('resource')
+    removed = get_tableau_client().invalidate_metadata(resource)
+    return jsonify({'success': True, 'invalidated': removed})
+
+@app.route('/stats')
+def stats():
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    return jsonify({
+        'metadata_cache': metadata_cache.stats(),
+        'export_cache': export_cache.stats(),
+        'artifact_store': artifact_store.stats(),
+        'sessions': session_interface.backend.stats() if session_interface else None,
+        'jobs': job_queue.stats(),
+        'schedulers': scheduler_stats()
+    })
+
+def fetch_view_pdf(tableau, view_id, workbook_index, filters=None):
+    """Stream a view's PDF export into the upload folder and return the file path"""
+    pdf_filename = f"dashboard_{workbook_index}_{datetime.now().timestamp()}.pdf"
+    pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
+    
+    tableau.export_view_to_file(view_id, pdf_path, filters=filters)
+    
+    return pdf_path
+
+def fetch_view_image(tableau, view_id, workbook_index, filters=None):
+    """Stream a server-rendered PNG of a view into the upload folder and return the file path"""
+    png_filename = f"dashboard_{workbook_index}_{datetime.now().timestamp()}.png"
+    png_path = os.path.join(app.config['UPLOAD_FOLDER'], png_filename)
+    
+    tableau.export_view_image_to_file(view_id, png_path, resolution=app.config['IMAGE_RESOLUTION'], filters=filters)
+    
+    return png_path
+
+def fetch_view(tableau, view_id, workbook_index, mode, filters=None):
+    """Download a view as a server-rendered PNG ('image' mode) or as a PDF.
+
+    Image mode skips local rasterization entirely; the PDF path is kept as the
+    fallback and for vector output."""
+    if mode == 'image':
+        try:
+            return fetch_view_image(tableau, view_id, workbook_index, filters)
+        except Exception as e:
+            logging.warning(f"Image export failed for view {view_id}, falling back to PDF: {str(e)}")
+    
+    return fetch_view_pdf(tableau, view_id, workbook_index, filters)
+
+def export_cache_key(tableau, view_id, mode, filters=None):
+    """Content address of a view export, or None when its metadata is unavailable"""
+    try:
+        view = tableau.get_view(view_id)
+        workbook_id = view.get('workbook', {}).get('id')
+        workbook = tableau.get_workbook(workbook_id) if workbook_id else {}
+    except Exception as e:
+        logging.warning(f"Export cache disabled for view {view_id}: {str(e)}")
+        return None
+    
+    options = {'mode': mode, 'resolution': app.config['IMAGE_RESOLUTION'], 'dpi': RASTER_DPI,
+               'backend': get_rasterizer().name, 'filters': filters or {}}
+    namespace = [tableau.server_url, tableau.site_id, tableau.user_id]
+    return export_cache.make_key(namespace, view_id, options, [view.get('updatedAt'), workbook.get('updatedAt')])
+
+def export_dpi(mode):
+    """Pixels per inch of an export's PNG for an export mode"""
+    return app.config['IMAGE_DPI'] if mode == 'image' else RASTER_DPI
+
+def fetch_export(tableau, view_id, workbook_index, mode, refresh=False, filters=None):
+    """Return (cache_key, cached_files, source_path).
+
+    On a cache hit cached_files maps 'pdf'/'png' to fresh copies in the upload
+    folder and nothing is downloaded. A hit without a cached PNG maps only
+    'pdf', and source_path is that PDF, to be rasterized again. On a miss
+    cached_files is None and source_path is the new download."""
+    cache_key = export_cache_key(tableau, view_id, mode, filters) if export_cache.enabled else None
+    
+    if cache_key and not refresh:
+        base_name = f"dashboard_{workbook_index}_{datetime.now().timestamp()}"
+        if mode == 'image':
+            cached = export_cache.get(cache_key, ['png'], app.config['UPLOAD_FOLDER'], base_name)
+        else:
+            cached = export_cache.get(cache_key, ['pdf'], app.config['UPLOAD_FOLDER'], base_name,
+                                      optional_kinds=['png'])
+        if cached and 'png' in cached:
+            artifact_store.set_dpi(cached['png'], export_dpi(mode))
+            return cache_key, cached, None
+        if cached:
+            # Skip the download; the PDF is rasterized again and its PNG added to the entry
+            return cache_key, cached, cached['pdf']
+    
+    source_path = fetch_view(tableau, view_id, workbook_index, mode, filters)
+    if mode == 'image' and source_path.endswith('.pdf'):
+        # A PDF fallback is rasterized at RASTER_DPI; don't cache it as an image export
+        cache_key = None
+    return cache_key, None, source_path
+
+def rasterize_export(processor, source_path, cache_key=None, cached=None):
+    """Return (pdf_path, png_path) for a downloaded export, rasterizing PDFs only.
+
+    The result is stored in the export cache under cache_key when one is given,
+    except for the kinds already in cached. Only then is the rasterized PNG
+    encoded (once, at its path), so a later hit skips pdf_to_png too."""
+    if source_path.endswith('.pdf'):
+        pdf_path, png_path = source_path, processor.pdf_to_png(source_path)
+    else:
+        pdf_path, png_path = None, source_path
+        artifact_store.set_dpi(png_path, app.config['IMAGE_DPI'])
+    
+    if cache_key:
+        files = {'pdf': pdf_path, 'png': artifact_store.materialize(png_path)}
+        export_cache.put(cache_key, {kind: path for kind, path in files.items() if kind not in (cached or {})})
+    
+    return pdf_path, png_path
+
+def export_slot(item, export):
+    """Session-slot fields for a successfully exported dashboard (reads no session state)"""
+    png_path = export['png_path']
+    slot = {
+        'view_id': item['view_id'],
+        'pdf_path': export['pdf_path'],
+        'png_path': png_path,
+        'preview_path': None,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'project': item.get('project_name', 'Unknown'),
+        'workbook': item.get('workbook_name', 'Unknown'),
+        'dashboard': item.get('dashboard_name', 'Unknown'),
+    }
+    
+    # Downscaled image for the crop UI; it falls back to the full image without one
+    try:
+        slot['preview_path'] = ImageProcessor().create_preview(png_path)
+    except Exception as e:
+        logging.warning(f"No crop preview for {png_path}: {str(e)}")
+    return slot
+
+# Slot fields that name an export's artifacts (files or artifact store entries)
+SLOT_ARTIFACT_KEYS = ('pdf_path', 'png_path', 'preview_path', 'cropped_path', 'cropped_pdf_path', 'thumbnail_path')
+
+def replace_artifacts(workbook, fields, keys=SLOT_ARTIFACT_KEYS):
+    """Remove the slot's artifacts under keys that fields does not carry over"""
+    kept = {fields.get(key) for key in keys}
+    remove_artifacts([workbook[key] for key in keys if workbook.get(key) and workbook[key] not in kept])
+
+def record_export(workbook_index, slot):
+    """Store an exported dashboard's slot in the session, replacing the previous export
+    and removing its artifacts"""
+    if 'workbooks' not in session:
+        session['workbooks'] = []
+    
+    while len(session['workbooks']) <= workbook_index:
+        session['workbooks'].append({})
+    
+    workbook = session['workbooks'][workbook_index]
+    replace_artifacts(workbook, slot)
+    # A vector crop and an auto-crop proposal belong to the previous export
+    for key in ('pdf_path', 'preview_path', 'cropped_pdf_path', 'auto_crop'):
+        workbook.pop(key, None)
+    workbook.update({key: value for key, value in slot.items() if value is not None})
+    session.modified = True
+    
+    return workbook['timestamp']
+
+def timed(func, *args):
+    """Call func and return its result together with the elapsed seconds"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, round(time.perf_counter() - started, 3)
+
 @app.route('/export_dashboard', methods=['POST'])
 def export_dashboard():
     if 'tableau_token' not in session:
@@ -150,52 +454,242 @@ def export_dashboard():
     
     try:
         data = request.get_json()
-        view_id = data['view_id']
-        workbook_index = data['workbook_index']
-        project_name = data.get('project_name', 'Unknown')
-        workbook_name = data.get('workbook_name', 'Unknown')
-        dashboard_name = data.get('dashboard_name', 'Unknown')
+        item = {key: data[key] for key in ('view_id', 'workbook_index', 'project_name', 'workbook_name',
+                                           'dashboard_name', 'mode') if key in data}
         
-        tableau = TableauAPI(session['tableau_server'], session['tableau_site'])
-        tableau.token = session['tableau_token']
-        tableau.site_id_response = session['tableau_site_id']
-        tableau.user_id = session['tableau_user_id']
+        tableau = get_tableau_client()
         
-        # Export as PDF
-        pdf_content = tableau.export_view_as_pdf(view_id)
-        pdf_filename = f"dashboard_{workbook_index}_{datetime.now().timestamp()}.pdf"
-        pdf_path = os.path.join(app.config['UPLOAD_FOLDER'], pdf_filename)
+        # Reuse a cached export when the view is unchanged, otherwise export as PNG or PDF
+        prepared = run_exports(None, tableau, [item], export_options(data))
+        result = record_exports(prepared)[0]
+        if not result['success']:
+            return jsonify({'error': result['error']}), 500
         
-        with open(pdf_path, 'wb') as f:
-            f.write(pdf_content)
+        return jsonify(result)
         
-        # Convert PDF to PNG
-        processor = ImageProcessor()
-        png_path = processor.pdf_to_png(pdf_path)
+    except Exception as e:
+        logging.error(f"Error exporting dashboard: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def export_views(tableau, jobs, refresh=False, progress=None):
+    """Export views concurrently and return one result per job, in job order.
+
+    Each job is a dict with view_id, workbook_index, mode and optional filters.
+    Downloads run on the bounded export pool (and the per-site render limit in
+    TableauAPI); each PDF is rasterized as soon as it arrives. progress, if
+    given, is called as progress(done=n) as each view finishes."""
+    processor = ImageProcessor()
+    results = [None] * len(jobs)
+    
+    def finished(i, result):
+        results[i] = result
+        if progress:
+            progress(done=sum(result is not None for result in results))
+    
+    fetches = {
+        export_pool.submit(instrumentation.propagate(timed), fetch_export, tableau, job['view_id'], job['workbook_index'],
+                           job['mode'], refresh, job.get('filters')): i
+        for i, job in enumerate(jobs)
+    }
+    rasterizations = {}
+    
+    for future in as_completed(fetches):
+        i = fetches[future]
+        try:
+            (cache_key, cached, source_path), fetch_seconds = future.result()
+        except Exception as e:
+            logging.error(f"Error exporting dashboard {jobs[i]['view_id']}: {str(e)}")
+            finished(i, {'success': False, 'error': str(e)})
+            continue
+        
+        if cached and 'png' in cached:
+            finished(i, {
+                'success': True,
+                'pdf_path': cached.get('pdf'),
+                'png_path': cached['png'],
+                'cache_hit': True,
+                'rasterized': False,
+                'timings': {'fetch_seconds': fetch_seconds, 'rasterize_seconds': 0.0}
+            })
+            continue
+        
+        rasterizations[rasterize_pool.submit(instrumentation.propagate(timed), rasterize_export, processor, source_path,
+                                             cache_key, cached)] = (i, fetch_seconds, bool(cached))
+    
+    for future in as_completed(rasterizations):
+        i, fetch_seconds, cache_hit = rasterizations[future]
+        try:
+            (pdf_path, png_path), rasterize_seconds = future.result()
+        except Exception as e:
+            logging.error(f"Error rasterizing dashboard {jobs[i]['view_id']}: {str(e)}")
+            finished(i, {'success': False, 'error': str(e)})
+            continue
+        
+        finished(i, {
+            'success': True,
+            'pdf_path': pdf_path,
+            'png_path': png_path,
+            'cache_hit': cache_hit,
+            'rasterized': True,
+            'timings': {'fetch_seconds': fetch_seconds, 'rasterize_seconds': rasterize_seconds},
+            'rasterize_report': processor.reports.get(png_path)
+        })
+    
+    return results
+
+def describe_filters(filters):
+    """Human-readable label for a set of view filters"""
+    return ', '.join(f"{field} = {value}" for field, value in filters.items())
+
+def export_options(data):
+    """Options shared by single, batch and queued export requests"""
+    return {
+        'mode': data.get('mode', app.config['EXPORT_MODE']),
+        'refresh': data.get('refresh', False),
+        'auto_crop': data.get('auto_crop', app.config['AUTO_CROP']),
+        'use_template': data.get('use_template', True),
+    }
+
+def run_exports(progress, tableau, items, options):
+    """Export, rasterize and crop dashboards without touching the session.
+
+    Returns one [workbook_index, slot, result] entry per item for record_exports();
+    slot is None for failed exports. Safe to run as a background job."""
+    jobs = [{'view_id': item['view_id'], 'workbook_index': item['workbook_index'],
+             'mode': item.get('mode', options['mode'])} for item in items]
+    exports = export_views(tableau, jobs, refresh=options['refresh'], progress=progress)
+    
+    slots = [export_slot(item, export) if export['success'] else None for item, export in zip(items, exports)]
+    if progress:
+        progress(message='Cropping')
+    templated = crop_exported_slots([slot for slot in slots if slot], options['auto_crop'], options['use_template'])
+    
+    prepared = []
+    for item, export, slot in zip(items, exports, slots):
+        if slot is None:
+            prepared.append([item['workbook_index'], None,
+                             {'workbook_index': item['workbook_index'], 'success': False, 'error': export['error']}])
+            continue
         
-        # Update session data
-        if 'workbooks' not in session:
-            session['workbooks'] = []
+        result = {
+            'workbook_index': item['workbook_index'],
+            'success': True,
+            'png_filename': os.path.basename(export['png_path']),
+            'timestamp': slot['timestamp'],
+            'cache_hit': export['cache_hit'],
+            'rasterized': export['rasterized'],
+            'timings': export['timings'],
+            'rasterize_report': export.get('rasterize_report'),
+            'crop_template': slot['view_id'] in templated,
+        }
+        if 'auto_crop' in slot:
+            result['auto_crop'] = slot['auto_crop']
+            result['auto_cropped'] = not result['crop_template'] and bool(slot.get('cropped'))
+        prepared.append([item['workbook_index'], slot, result])
+    
+    return prepared
+
+def record_exports(prepared, store=True):
+    """Store run_exports() output in the session and return the per-dashboard results"""
+    results = []
+    for workbook_index, slot, result in prepared:
+        if slot is not None:
+            if store:
+                record_export(workbook_index, slot)
+            if slot.get('cropped'):
+                result['thumbnail_url'] = image_url(slot['thumbnail_path'])
+        results.append(result)
+    return results
+
+@app.route('/export_dashboards', methods=['POST'])
+def export_dashboards():
+    """Export every selected dashboard at once: PDFs are fetched concurrently and
+    each one is rasterized as soon as it arrives."""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        data = request.get_json()
+        items = data.get('items', [])
+        if not items:
+            return jsonify({'error': 'No dashboards selected'}), 400
         
-        while len(session['workbooks']) <= workbook_index:
-            session['workbooks'].append({})
+        started = time.perf_counter()
+        tableau = get_tableau_client()
+        results = record_exports(run_exports(None, tableau, items, export_options(data)))
         
-        session['workbooks'][workbook_index]['pdf_path'] = pdf_path
-        session['workbooks'][workbook_index]['png_path'] = png_path
-        session['workbooks'][workbook_index]['timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        session['workbooks'][workbook_index]['project'] = project_name
-        session['workbooks'][workbook_index]['workbook'] = workbook_name
-        session['workbooks'][workbook_index]['dashboard'] = dashboard_name
-        session.modified = True
+        elapsed = round(time.perf_counter() - started, 3)
+        logging.info(f"Batch exported {len(items)} dashboards in {elapsed}s")
         
         return jsonify({
-            'success': True,
-            'png_filename': os.path.basename(png_path),
-            'timestamp': session['workbooks'][workbook_index]['timestamp']
+            'success': all(result['success'] for result in results),
+            'results': results,
+            'elapsed_seconds': elapsed
         })
         
     except Exception as e:
-        logging.error(f"Error exporting dashboard: {str(e)}")
+        logging.error(f"Error exporting dashboards: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/export_filtered', methods=['POST'])
+def export_filtered():
+    """Export one view once per filter combination (e.g. per region) in parallel
+    and combine the images, in request order, into a single PDF or Word report."""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        data = request.get_json()
+        view_id = data['view_id']
+        filter_sets = data.get('filters', [])
+        if not filter_sets:
+            return jsonify({'error': 'No filter values provided'}), 400
+        
+        output_format = data.get('format', 'pdf')
+        base_filename = os.path.splitext(data.get('filename', 'filtered_report'))[0].strip() or 'filtered_report'
+        profile = data.get('profile', DEFAULT_OUTPUT_PROFILE) or None
+        if profile and profile not in OUTPUT_PROFILES:
+            return jsonify({'error': f"Unknown output profile '{profile}'"}), 400
+        mode = data.get('mode', app.config['EXPORT_MODE'])
+        dashboard_name = data.get('dashboard_name', 'Unknown')
+        
+        tableau = get_tableau_client()
+        jobs = [{'view_id': view_id, 'workbook_index': f"filtered_{i}", 'mode': mode, 'filters': filters}
+                for i, filters in enumerate(filter_sets)]
+        exports = export_views(tableau, jobs, refresh=data.get('refresh', False))
+        
+        failures = [f"{describe_filters(filters)}: {export['error']}"
+                    for filters, export in zip(filter_sets, exports) if not export['success']]
+        if failures:
+            return jsonify({'error': 'Some filter exports failed', 'failures': failures}), 502
+        
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        image_paths = [export['png_path'] for export in exports]
+        summary_data = [{
+            'section': i + 1,
+            'project': data.get('project_name', 'Unknown'),
+            'workbook': data.get('workbook_name', 'Unknown'),
+            'dashboard': f"{dashboard_name} ({describe_filters(filters)})",
+            'timestamp': timestamp,
+            'image_path': path
+        } for i, (filters, path) in enumerate(zip(filter_sets, image_paths))]
+        
+        # The per-filter exports are not kept in the session, so remove them once the report is sent
+        export_paths = [path for export in exports for path in (export.get('pdf_path'), export['png_path']) if path]
+        try:
+            chunks, mimetype = stream_document(output_format, image_paths, image_paths, summary_data, profile)
+        except Exception:
+            remove_artifacts(export_paths)
+            raise
+        
+        response = Response(chunks, mimetype=mimetype)
+        set_attachment(response, f"{base_filename}.{'pdf' if output_format == 'pdf' else 'docx'}")
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(lambda: remove_artifacts(export_paths))
+        return response
+        
+    except Exception as e:
+        logging.error(f"Error exporting filtered dashboards: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/crop/<int:workbook_index>')
@@ -213,11 +707,108 @@ def crop_image(workbook_index):
         return redirect(url_for('index'))
     
     png_filename = os.path.basename(workbook['png_path'])
+    preview_path = workbook.get('preview_path') or workbook['png_path']
+    full_width, full_height = artifact_store.get_size(workbook['png_path'])
+    # Start from the view's saved crop, else the auto-detected content box
+    template = crop_templates.get(workbook.get('view_id', ''))
+    if template:
+        proposal = crop_templates.to_pixels(template, (full_width, full_height))
+    else:
+        proposal = workbook.get('auto_crop')
     return render_template('crop.html', 
                          workbook_index=workbook_index, 
                          png_filename=png_filename,
+                         preview_path=preview_path,
+                         full_width=full_width,
+                         full_height=full_height,
+                         proposal=proposal,
+                         has_template=bool(template),
                          workbook=workbook)
 
+def crop_slot(slot, crop_data, frame_size=None, crop_mode=None):
+    """Crop a slot's exported image (and its PDF page in vector mode) and return the fields to store.
+
+    crop_data is in the pixel space of frame_size (the image the selection was
+    drawn on) or of the full image when frame_size is None."""
+    original_path = slot['png_path']
+    
+    # Process the cropped image
+    processor = ImageProcessor()
+    cropped_path = processor.crop_image(original_path, crop_data, frame_size)
+    
+    # Create thumbnail for preview
+    thumbnail_path = processor.create_thumbnail(cropped_path)
+    
+    # Crop the original PDF page too so PDF reports keep vector content
+    cropped_pdf_path = None
+    if (crop_mode or app.config['CROP_MODE']) == 'vector' and slot.get('pdf_path'):
+        try:
+            image_size = frame_size or artifact_store.get_size(original_path)
+            cropped_pdf_path = processor.crop_pdf(slot['pdf_path'], crop_data, image_size)
+        except Exception as e:
+            logging.warning(f"Vector crop failed, using raster crop: {str(e)}")
+    
+    return {
+        'cropped_path': cropped_path,
+        'thumbnail_path': thumbnail_path,
+        'cropped_pdf_path': cropped_pdf_path,
+        'cropped': True
+    }
+
+def apply_crop(workbook_index, crop_data, frame_size=None, crop_mode=None):
+    """Crop a session slot and record the result; returns the stored crop fields"""
+    workbook = session['workbooks'][workbook_index]
+    cropped = crop_slot(workbook, crop_data, frame_size, crop_mode)
+    
+    # Update session; the previous crop's images are no longer referenced
+    replace_artifacts(workbook, cropped, ('cropped_path', 'cropped_pdf_path', 'thumbnail_path'))
+    workbook.pop('cropped_pdf_path', None)
+    workbook.update({key: value for key, value in cropped.items() if value is not None})
+    session.modified = True
+    
+    return cropped
+
+def crop_exported_slots(slots, auto_crop_mode, use_template=True):
+    """Crop freshly exported slots in place before they are stored.
+
+    A slot whose view has a saved crop template is cropped with it. For the
+    rest, content boxes are detected in one batch: 'propose' keeps the box for
+    the crop page to preselect, 'apply' crops to it straight away. Returns the
+    view ids that were cropped from a template."""
+    templated = set()
+    pending = []
+    for slot in slots:
+        template = crop_templates.get(slot['view_id']) if use_template else None
+        if not template:
+            pending.append(slot)
+            continue
+        try:
+            crop_data = crop_templates.to_pixels(template, artifact_store.get_size(slot['png_path']))
+            slot.update(crop_slot(slot, crop_data))
+            templated.add(slot['view_id'])
+        except Exception as e:
+            logging.warning(f"Saved crop for view {slot['view_id']} failed: {str(e)}")
+            pending.append(slot)
+    
+    if auto_crop_mode not in ('propose', 'apply') or not pending:
+        return templated
+    
+    try:
+        boxes = ImageProcessor().detect_content_boxes([slot['png_path'] for slot in pending])
+    except Exception as e:
+        logging.warning(f"Auto-crop detection failed: {str(e)}")
+        return templated
+    
+    for slot, box in zip(pending, boxes):
+        slot['auto_crop'] = box
+        if auto_crop_mode == 'apply':
+            try:
+                slot.update(crop_slot(slot, box))
+            except Exception as e:
+                logging.warning(f"Auto-crop of view {slot['view_id']} failed: {str(e)}")
+    
+    return templated
+
 @app.route('/save_crop', methods=['POST'])
 def save_crop():
     if 'tableau_token' not in session:
@@ -225,147 +816,323 @@ def save_crop():
     
     try:
         data = request.get_json()
-        workbook_index = data['workbook_index']
-        crop_data = data['crop_data']
-        
-        workbook = session['workbooks'][workbook_index]
-        original_path = workbook['png_path']
+        # Size of the image the selection was drawn on (the crop preview), if not the original
+        frame_size = tuple(data['frame_size']) if data.get('frame_size') else None
         
-        # Process the cropped image
-        processor = ImageProcessor()
-        cropped_path = processor.crop_image(original_path, crop_data)
-        
-        # Create thumbnail for preview
-        thumbnail_path = processor.create_thumbnail(cropped_path)
+        workbook_index = data['workbook_index']
+        cropped = apply_crop(workbook_index, data['crop_data'], frame_size, data.get('crop_mode'))
+        cropped_path, thumbnail_path = cropped['cropped_path'], cropped['thumbnail_path']
         
-        # Update session
-        session['workbooks'][workbook_index]['cropped_path'] = cropped_path
-        session['workbooks'][workbook_index]['thumbnail_path'] = thumbnail_path
-        session['workbooks'][workbook_index]['cropped'] = True
-        session.modified = True
+        # Remember the rectangle so the next export of this view is cropped the same way
+        view_id = session['workbooks'][workbook_index].get('view_id')
+        if view_id and data.get('save_template', True):
+            crop_templates.save(view_id, data['crop_data'],
+                                frame_size or artifact_store.get_size(session['workbooks'][workbook_index]['png_path']))
         
         return jsonify({
             'success': True, 
             'cropped_filename': os.path.basename(cropped_path),
-            'thumbnail_filename': os.path.basename(thumbnail_path)
+            'thumbnail_filename': os.path.basename(thumbnail_path),
+            'thumbnail_url': image_url(thumbnail_path),
+            'vector': bool(cropped['cropped_pdf_path'])
         })
         
     except Exception as e:
         logging.error(f"Error saving crop: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/combine', methods=['POST'])
-def combine_images():
+@app.route('/crop_template/<view_id>', methods=['DELETE'])
+def delete_crop_template(view_id):
+    """Forget the saved crop for a view so its next export is left uncropped"""
     if 'tableau_token' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
+    return jsonify({'success': True, 'deleted': crop_templates.delete(view_id)})
+
+def combine_options(data):
+    """Validate a combine request against the session; returns (options, error_response)"""
     if 'workbooks' not in session:
-        return jsonify({'error': 'No workbooks selected'}), 400
+        return None, (jsonify({'error': 'No workbooks selected'}), 400)
     
     # Check if all images are cropped
     for workbook in session['workbooks']:
         if not workbook.get('cropped', False):
-            return jsonify({'error': 'Please crop all images before combining'}), 400
+            return None, (jsonify({'error': 'Please crop all images before combining'}), 400)
+    
+    output_format = data.get('format', 'pdf')
+    custom_filename = data.get('filename', 'dashboard_report')
+    profile = data.get('profile', DEFAULT_OUTPUT_PROFILE) or None
+    if profile and profile not in OUTPUT_PROFILES:
+        return None, (jsonify({'error': f"Unknown output profile '{profile}'"}), 400)
     
+    # Remove extension from filename if provided
+    base_filename = custom_filename
+    if custom_filename.endswith('.pdf') or custom_filename.endswith('.docx'):
+        base_filename = os.path.splitext(custom_filename)[0]
+    
+    # Use default filename if empty
+    if not base_filename.strip():
+        base_filename = 'tableau_report'
+    
+    if not any(wb.get('cropped_path') for wb in session['workbooks']):
+        return None, (jsonify({'error': 'No cropped images found'}), 400)
+    
+    return {
+        'format': output_format,
+        'filename': custom_filename,
+        'base_filename': base_filename,
+        'profile': profile,
+        # Snapshot of the slots, so a queued job does not need the session
+        'workbooks': [dict(wb) for wb in session['workbooks']]
+    }, None
+
+def report_sources(workbooks):
+    """Cropped image paths, PDF page sources (vector crops where available) and
+    per-dashboard summary rows for a report"""
+    cropped_paths = [wb['cropped_path'] for wb in workbooks if wb.get('cropped_path')]
+    pdf_pages = [wb.get('cropped_pdf_path') or wb['cropped_path'] for wb in workbooks if wb.get('cropped_path')]
+    
+    # Generate summary data for Word document
+    summary_data = []
+    for i, wb in enumerate(workbooks):
+        summary_data.append({
+            'section': i + 1,
+            'project': wb.get('project', 'Unknown'),
+            'workbook': wb.get('workbook', 'Unknown'), 
+            'dashboard': wb.get('dashboard', 'Unknown'),
+            'timestamp': wb.get('timestamp', 'Unknown'),
+            'image_path': wb.get('cropped_path', '')
+        })
+    return cropped_paths, pdf_pages, summary_data
+
+def build_report(progress, options):
+    """Combine the cropped slots in options into a PDF or Word report and return its path"""
+    processor = ImageProcessor()
+    cropped_paths, pdf_pages, summary_data = report_sources(options['workbooks'])
+    if progress:
+        progress(done=0, total=len(cropped_paths), message=f"Combining {len(cropped_paths)} dashboards")
+    
+    # Create temporary output directory; names are unique so jobs never share (or delete) a file
+    temp_dir = os.path.join(app.config['OUTPUT_FOLDER'], 'temp')
+    os.makedirs(temp_dir, exist_ok=True)
+    output_name = f"{options['base_filename']}_{uuid.uuid4().hex[:12]}"
+    
+    if options['format'] == 'pdf':
+        output_path = processor.combine_to_pdf(pdf_pages, temp_dir, output_name, options['profile'])
+    else:
+        output_path = processor.combine_to_word_with_details(cropped_paths, temp_dir, output_name,
+                                                             summary_data, options['profile'])
+    
+    if progress:
+        progress(done=len(cropped_paths))
+    return output_path
+
+def stream_document(output_format, pdf_pages, image_paths, summary_data, profile):
+    """A PDF or Word report as (chunks, mimetype), without writing it to disk.
+
+    PDF chunks are produced page by page while the response is being sent;
+    the first page is built here, so failures up to then can still be
+    answered with an error status. A later failure aborts the chunked
+    response without its final chunk, so clients see an incomplete download
+    rather than a short file. Word documents are zip packages, so they are
+    built in memory first."""
+    processor = ImageProcessor()
+    if output_format == 'pdf':
+        chunks = processor.stream_pdf(pdf_pages, profile)
+        first = next(chunks, b'')
+        return itertools.chain([first], chunks), 'application/pdf'
+    
+    buffer = io.BytesIO()
+    processor.write_word_with_details(buffer, image_paths, summary_data, profile)
+    return [buffer.getvalue()], 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+def stream_report(options):
+    """The combined report for the cropped slots in options (see stream_document)"""
+    cropped_paths, pdf_pages, summary_data = report_sources(options['workbooks'])
+    return stream_document(options['format'], pdf_pages, cropped_paths, summary_data, options['profile'])
+
+def set_attachment(response, filename):
+    """Content-Disposition for a download, with an RFC 5987 name for non-ASCII filenames (as send_file)"""
     try:
-        # Get data from JSON request
-        data = request.get_json()
-        output_format = data.get('format', 'pdf')
-        custom_filename = data.get('filename', 'dashboard_report')
-        
-        # Remove extension from filename if provided
-        base_filename = custom_filename
-        if custom_filename.endswith('.pdf') or custom_filename.endswith('.docx'):
-            base_filename = os.path.splitext(custom_filename)[0]
-        
-        # Use default filename if empty
-        if not base_filename.strip():
-            base_filename = 'tableau_report'
-        
-        processor = ImageProcessor()
-        
-        # Get cropped image paths
-        cropped_paths = [wb['cropped_path'] for wb in session['workbooks'] if wb.get('cropped_path')]
-        
-        if not cropped_paths:
-            return jsonify({'error': 'No cropped images found'}), 400
-        
-        # Create temporary output directory
-        temp_dir = os.path.join(app.config['OUTPUT_FOLDER'], 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Generate summary data for Word document
-        summary_data = []
-        for i, wb in enumerate(session['workbooks']):
-            summary_data.append({
-                'section': i + 1,
-                'project': wb.get('project', 'Unknown'),
-                'workbook': wb.get('workbook', 'Unknown'), 
-                'dashboard': wb.get('dashboard', 'Unknown'),
-                'timestamp': wb.get('timestamp', 'Unknown'),
-                'image_path': wb.get('cropped_path', '')
-            })
-        
-        # Combine images
-        if output_format == 'pdf':
-            output_path = processor.combine_to_pdf(cropped_paths, temp_dir, base_filename)
-        else:
-            output_path = processor.combine_to_word_with_details(cropped_paths, temp_dir, base_filename, summary_data)
-        
-        # Return file for download
-        def cleanup_after_download():
-            # Clean up temporary files after a delay
-            import threading
-            import time
-            def delayed_cleanup():
-                time.sleep(30)  # Wait 30 seconds before cleanup
-                try:
-                    for wb in session['workbooks']:
-                        for path_key in ['pdf_path', 'png_path', 'cropped_path']:
-                            if path_key in wb and os.path.exists(wb[path_key]):
-                                os.remove(wb[path_key])
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                except:
-                    pass
-            threading.Thread(target=delayed_cleanup).start()
-        
-        cleanup_after_download()
-        
-        return send_file(output_path, as_attachment=True, download_name=custom_filename)
-        
+        filename.encode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=filename)
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        response.headers.set('Content-Disposition', 'attachment', filename=simple,
+                             **{'filename*': f"UTF-8''{quote(filename, safe='')}"})
+
+@app.route('/combine', methods=['POST'])
+def combine_images():
+    """Combine the cropped dashboards and stream the report back as it is built"""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    options, error = combine_options(request.get_json())
+    if error:
+        return error
+    
+    try:
+        chunks, mimetype = stream_report(options)
     except Exception as e:
         logging.error(f"Error combining images: {str(e)}")
         return jsonify({'error': str(e)}), 500
+    
+    response = Response(chunks, mimetype=mimetype)
+    set_attachment(response, options['filename'])
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-@app.route('/download')
-def download_result():
-    if 'last_output' not in session:
-        flash('No file to download', 'error')
-        return redirect(url_for('index'))
+def export_job(progress, credentials, items, options):
+    return run_exports(progress, client_from_credentials(credentials), items, options)
+
+def combine_job(progress, options):
+    return {'output_path': build_report(progress, options), 'filename': options['filename']}
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an export ("kind": "export", with items like /export_dashboards or a single
+    view like /export_dashboard) or a report ("kind": "combine", options as /combine).
+
+    Returns 202 at once; follow events_url (or poll status_url) for progress and
+    fetch result_url when done."""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    output_path = session['last_output']
-    if not os.path.exists(output_path):
-        flash('Output file not found', 'error')
-        return redirect(url_for('index'))
+    data = request.get_json() or {}
+    owner = session['tableau_user_id']
+    kind = data.get('kind')
+    
+    if kind == 'export':
+        items = data.get('items') or ([data] if data.get('view_id') else [])
+        if not items:
+            return jsonify({'error': 'No dashboards selected'}), 400
+        job_id = job_queue.submit('export', owner, export_job, tableau_credentials(), items,
+                                  export_options(data), total=len(items))
+    elif kind == 'combine':
+        options, error = combine_options(data)
+        if error:
+            return error
+        job_id = job_queue.submit('combine', owner, combine_job, options)
+    else:
+        return jsonify({'error': f"Unknown job kind '{kind}'"}), 400
+    
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('job_status', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
     
-    return send_file(output_path, as_attachment=True)
+    job = job_queue.get(job_id, session['tableau_user_id'], include_result=False)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job)
+
+def sse_message(event, data, event_id=None):
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-Sent Events stream of a job's stages (auth, download, rasterize, crop,
+    assemble, progress) with elapsed seconds, ending with an "end" event carrying the
+    job status. Each connection ends after JOB_EVENTS_STREAM_SECONDS so it does not
+    hold a server thread for a whole job; EventSource reconnects after the retry
+    delay and resumes after Last-Event-ID."""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    if job_queue.get(job_id, session['tableau_user_id'], include_result=False) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+    except ValueError:
+        after = 0
+    
+    def stream():
+        last_seq = after
+        idle = 0.0
+        started = time.monotonic()
+        yield "retry: 1000\n\n"
+        while True:
+            # Read the status before the events so none written before it finished are missed
+            job = job_queue.get(job_id, include_result=False)
+            for seq, stage, data in job_queue.events(job_id, last_seq):
+                last_seq = seq
+                idle = 0.0
+                yield sse_message(stage, data, seq)
+            if job is None or job['status'] in FINISHED:
+                yield sse_message('end', {
+                    'status': job['status'] if job else 'failed',
+                    'error': job['error'] if job else 'Job not found',
+                    'elapsed_seconds': round(job['updated'] - job['created'], 3) if job else None
+                })
+                return
+            if time.monotonic() - started >= JOB_EVENTS_STREAM_SECONDS:
+                return
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+            idle += JOB_EVENTS_POLL_SECONDS
+            if idle >= JOB_EVENTS_KEEPALIVE_SECONDS:
+                idle = 0.0
+                yield ": keepalive\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """A finished job's result: export results (stored in the session on first
+    collection) or the combined report as a download."""
+    if 'tableau_token' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    job = job_queue.get(job_id, session['tableau_user_id'])
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify({'error': 'Job not finished', 'status': job['status']}), 409
+    
+    if job['kind'] == 'combine':
+        output_path = job['result']['output_path']
+        if not os.path.exists(output_path):
+            return jsonify({'error': 'Output file not found'}), 410
+        return send_file(output_path, as_attachment=True, download_name=job['result']['filename'])
+    
+    results = record_exports(job['result'], store=job_queue.claim(job_id))
+    return jsonify({
+        'success': all(result['success'] for result in results),
+        'results': results,
+        'elapsed_seconds': round(job['updated'] - job['created'], 3)
+    })
+
+def remove_artifacts(paths):
+    """Forget artifacts and delete their files, if any"""
+    for path in paths:
+        artifact_store.discard(path)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
 
 @app.route('/reset')
 def reset():
     # Clean up any uploaded files
     if 'workbooks' in session:
         for wb in session['workbooks']:
-            for path_key in ['pdf_path', 'png_path', 'cropped_path']:
-                if path_key in wb and os.path.exists(wb[path_key]):
-                    try:
-                        os.remove(wb[path_key])
-                    except:
-                        pass
+            remove_artifacts([wb[path_key] for path_key in SLOT_ARTIFACT_KEYS if wb.get(path_key)])
     
     # Clear session data except authentication
     keys_to_keep = ['tableau_token', 'tableau_site_id', 'tableau_user_id', 
-                   'tableau_server', 'tableau_site', 'username']
+                   'tableau_server', 'tableau_site', 'tableau_token_issued_at', 'username']
     session_copy = {k: v for k, v in session.items() if k in keys_to_keep}
     session.clear()
     session.update(session_copy)
@@ -375,8 +1142,48 @@ def reset():
 
 @app.route('/image/<filename>')
 def serve_image(filename):
-    """Serve uploaded images"""
-    return send_file(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+    """Serve uploaded images with strong ETags and conditional GET.
+
+    Browsers that accept WebP/AVIF get a compact variant, built lazily and
+    kept in the artifact store. URLs carrying the current content hash as
+    ?v= (see image_url) are cached as immutable; others are revalidated."""
+    image_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if not artifact_store.exists(image_path):
+        return jsonify({'error': 'Image not found'}), 404
+    
+    etag = artifact_store.get_etag(image_path)
+    variant = next((fmt for fmt in VARIANT_FORMATS if f"image/{fmt}" in request.accept_mimetypes), None)
+    response_etag = f"{etag}-{variant}" if variant else etag
+    
+    if request.args.get('v') == etag:
+        cache_control = 'private, max-age=31536000, immutable'
+    else:
+        cache_control = 'private, no-cache'
+    
+    if request.if_none_match.contains(response_etag):
+        response = app.response_class(status=304)
+    elif variant:
+        response = app.response_class(artifact_store.get_variant(image_path, variant), mimetype=f"image/{variant}")
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = app.response_class(artifact_store.get_bytes(image_path), mimetype=mimetype)
+    
+    response.set_etag(response_etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept')
+    return response
+
+@app.context_processor
+def image_url_processor():
+    return {'image_url': image_url}
+
+def image_url(path):
+    """Content-addressed URL for an uploaded image, safe to cache as immutable"""
+    try:
+        return url_for('serve_image', filename=os.path.basename(path), v=artifact_store.get_etag(path))
+    except Exception as e:
+        logging.warning(f"No content hash for {path}: {str(e)}")
+        return url_for('serve_image', filename=os.path.basename(path))
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
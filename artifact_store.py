@@ -0,0 +1,382 @@
+import io
+import os
+import mmap
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, features
+
+# Modes whose raw bytes fully describe the image, so they can be spilled and mapped back
+SPILLABLE_MODES = {"L", "RGB", "RGBA"}
+
+FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG"}
+
+# PNG zlib level (0-9) for every PNG encoded from a held bitmap; unset uses Pillow's default
+PNG_COMPRESS_LEVEL = int(os.environ["PNG_COMPRESS_LEVEL"]) if os.environ.get("PNG_COMPRESS_LEVEL") else None
+
+# Compact encodings served to browsers that accept them: lossless WebP keeps
+# dashboard text exact; AVIF needs a Pillow build with AVIF support
+VARIANT_OPTIONS = {
+    "webp": {"lossless": True, "method": 4},
+    "avif": {"quality": 80},
+}
+VARIANT_FORMATS = [fmt for fmt in ("avif", "webp") if features.check(fmt)]
+
+
+class _Artifact:
+    __slots__ = ("image", "encoded", "spill", "dirty", "nbytes", "etag", "variants", "compress_level")
+
+    def __init__(self, image: Optional[Image.Image], dirty: bool, compress_level: Optional[int] = None):
+        self.image = image
+        # PNG zlib level for this artifact's encode, if not PNG_COMPRESS_LEVEL
+        self.compress_level = compress_level
+        self.encoded = None
+        # (path, mode, size) of the raw pixel file once spilled
+        self.spill = None
+        # True while the artifact only exists in memory (nothing written at its path yet)
+        self.dirty = dirty
+        self.nbytes = 0
+        # Content hash of the encoded bytes and lazily built compact encodings
+        self.etag = None
+        self.variants = {}
+
+
+class ArtifactStore:
+    """Keeps intermediate images in memory between export, crop and combine.
+
+    Artifacts are keyed by the path they would have on disk, so session slots
+    keep storing plain paths and code that really needs a file calls
+    materialize(). Decoded bitmaps are held up to max_bytes; past that the
+    least-recently-used ones are spilled as raw pixels to spill_dir and mapped
+    back with mmap, so neither direction costs a PNG encode or decode. Spill
+    files are bounded by max_spill_bytes; past that the oldest spilled
+    artifacts are written out at their paths and dropped from the store. Encoded
+    bytes are cached once produced (e.g. for serving the crop preview).
+    With max_bytes = 0 every put is written straight to disk. The pixel
+    density of each artifact's source (set by whoever produced it) is kept
+    alongside, so reports can place images at their physical size.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, spill_dir: Optional[str] = None,
+                 max_spill_bytes: int = 1024 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "tableau_artifacts")
+        self._entries: "OrderedDict[str, _Artifact]" = OrderedDict()
+        # Source DPI per artifact; kept apart from the entries, which come and go with memory pressure
+        self._dpi: Dict[str, float] = {}
+        self._bytes = 0
+        self._spill_bytes = 0
+        self._lock = threading.RLock()
+        self.decodes = 0
+        self.encodes = 0
+        self.spills = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _format(path: str) -> str:
+        return FORMATS.get(os.path.splitext(path)[1].lower(), "PNG")
+
+    def _save(self, image: Image.Image, target: Any, path: str, compress_level: Optional[int] = None):
+        """Encode image into target (a path or buffer) in the format path implies"""
+        options = {}
+        level = PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+        if self._format(path) == "PNG" and level is not None:
+            options["compress_level"] = level
+        image.save(target, self._format(path), **options)
+        self.encodes += 1
+
+    def put_image(self, path: str, image: Image.Image, dpi: Optional[float] = None,
+                  compress_level: Optional[int] = None) -> str:
+        """Store a bitmap under the path it would be saved to and return that path.
+
+        compress_level overrides PNG_COMPRESS_LEVEL for whenever it is encoded."""
+        if dpi:
+            self.set_dpi(path, dpi)
+        if not self.enabled:
+            self._save(image, path, path, compress_level)
+            return path
+
+        with self._lock:
+            key = self._key(path)
+            if key in self._entries:
+                self._remove(key)
+            entry = _Artifact(image, dirty=True, compress_level=compress_level)
+            self._entries[key] = entry
+            self._account(entry)
+            self._shrink()
+        return path
+
+    def get_image(self, path: str) -> Image.Image:
+        """Return the bitmap for a path, decoding it from disk only if it is not held"""
+        with self._lock:
+            key = self._key(path)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if entry.image is None and entry.spill:
+                    entry.image = self._map(*entry.spill)
+                if entry.image is not None:
+                    return entry.image
+
+        if not os.path.exists(path):
+            raise Exception(f"Artifact not found: {path}")
+
+        image = Image.open(path)
+        image.load()
+        self.decodes += 1
+
+        if self.enabled:
+            with self._lock:
+                key = self._key(path)
+                if key not in self._entries:
+                    entry = _Artifact(image, dirty=False)
+                    self._entries[key] = entry
+                    self._account(entry)
+                    self._shrink()
+        return image
+
+    def get_size(self, path: str) -> Tuple[int, int]:
+        """(width, height) of an artifact, read from the file header if it is not held"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None:
+                if entry.image is not None:
+                    return entry.image.size
+                if entry.spill:
+                    return entry.spill[2]
+        with Image.open(path) as image:
+            return image.size
+
+    def get_bytes(self, path: str) -> bytes:
+        """Return the encoded file contents for a path, encoding at most once"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None and entry.encoded is not None:
+                return entry.encoded
+            if entry is None or not entry.dirty:
+                with open(path, "rb") as f:
+                    return f.read()
+
+            buffer = io.BytesIO()
+            self._save(self.get_image(path), buffer, path, entry.compress_level)
+            encoded = entry.encoded = buffer.getvalue()
+            self._account(entry)
+            self._shrink()
+            return encoded
+
+    def get_encoded(self, path: str) -> Optional[bytes]:
+        """Encoded bytes if they already exist (cached or on disk), else None; never encodes"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None and entry.encoded is not None:
+                return entry.encoded
+            if entry is not None and entry.dirty:
+                return None
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            return f.read()
+
+    def get_etag(self, path: str) -> str:
+        """Strong validator: a hash of the artifact's encoded bytes"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None and entry.etag:
+                return entry.etag
+
+        etag = hashlib.sha256(self.get_bytes(path)).hexdigest()[:32]
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None:
+                entry.etag = etag
+        return etag
+
+    def get_variant(self, path: str, fmt: str) -> bytes:
+        """The artifact re-encoded as fmt (see VARIANT_FORMATS), built once and kept with it"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None and fmt in entry.variants:
+                return entry.variants[fmt]
+
+        buffer = io.BytesIO()
+        image = self.get_image(path)
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        image.save(buffer, fmt.upper(), **VARIANT_OPTIONS.get(fmt, {}))
+        self.encodes += 1
+        variant = buffer.getvalue()
+
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None:
+                entry.variants[fmt] = variant
+                self._account(entry)
+                self._shrink()
+        return variant
+
+    def set_dpi(self, path: str, dpi: float):
+        """Record the pixels per inch an artifact was rendered at"""
+        with self._lock:
+            self._dpi[self._key(path)] = float(dpi)
+
+    def get_dpi(self, path: str) -> Optional[float]:
+        """The pixels per inch an artifact was rendered at, if recorded"""
+        with self._lock:
+            return self._dpi.get(self._key(path))
+
+    def exists(self, path: str) -> bool:
+        with self._lock:
+            if self._key(path) in self._entries:
+                return True
+        return os.path.exists(path)
+
+    def pending(self, path: str) -> bool:
+        """True while the artifact exists only in memory (not yet written at its path)"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            return entry is not None and entry.dirty
+
+    def size(self, path: str) -> int:
+        """Encoded size when known, otherwise the in-memory bitmap size"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is not None and entry.dirty:
+                if entry.encoded is not None:
+                    return len(entry.encoded)
+                image = entry.image or self._map(*entry.spill)
+                return image.width * image.height * len(image.getbands())
+        return os.path.getsize(path)
+
+    def materialize(self, path: str) -> str:
+        """Make sure the artifact exists as a file at its path (one encode if needed)"""
+        with self._lock:
+            entry = self._entries.get(self._key(path))
+            if entry is None or not entry.dirty:
+                return path
+
+            if entry.encoded is not None:
+                with open(path, "wb") as f:
+                    f.write(entry.encoded)
+            else:
+                self._save(self.get_image(path), path, path, entry.compress_level)
+            entry.dirty = False
+        return path
+
+    def discard(self, path: str):
+        """Forget an artifact (the file at its path, if any, is left alone)"""
+        with self._lock:
+            key = self._key(path)
+            self._dpi.pop(key, None)
+            if key in self._entries:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "decodes": self.decodes,
+                "encodes": self.encodes,
+                "spills": self.spills,
+                "spill_bytes": self._spill_bytes,
+                "max_spill_bytes": self.max_spill_bytes,
+            }
+
+    def _account(self, entry: _Artifact):
+        size = len(entry.encoded) if entry.encoded is not None else 0
+        size += sum(len(variant) for variant in entry.variants.values())
+        if entry.image is not None and not entry.spill:
+            size += entry.image.width * entry.image.height * len(entry.image.getbands())
+        self._bytes += size - entry.nbytes
+        entry.nbytes = size
+
+    def _shrink(self):
+        """Spill or drop least-recently-used bitmaps until the store fits in max_bytes"""
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries.get(key)
+            if entry is None or entry.nbytes == 0:
+                continue
+
+            if not entry.dirty:
+                # Already on disk; it can simply be decoded again if needed
+                self._remove(key)
+                continue
+
+            if entry.spill:
+                # Pixels are already mapped from the spill file; only the encoded copies cost memory
+                entry.encoded = None
+                entry.variants = {}
+                self._account(entry)
+            elif entry.image.mode in SPILLABLE_MODES:
+                self._spill(key, entry)
+            else:
+                self.materialize(key)
+                self._remove(key)
+
+    def _spill(self, key: str, entry: _Artifact):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        image = entry.image
+        fd, spill_path = tempfile.mkstemp(suffix=".raw", dir=self.spill_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(image.tobytes())
+
+        entry.image = None
+        entry.encoded = None
+        entry.variants = {}
+        entry.spill = (spill_path, image.mode, image.size)
+        self._account(entry)
+        self._spill_bytes += self._spill_size(entry)
+        self.spills += 1
+        logging.debug(f"Spilled artifact {key} to {spill_path}")
+
+        # Past the spill bound the oldest spilled artifacts go to disk as regular files
+        for spilled_key in [spilled_key for spilled_key, spilled in self._entries.items() if spilled.spill]:
+            if self._spill_bytes <= self.max_spill_bytes:
+                break
+            self.materialize(spilled_key)
+            self._remove(spilled_key)
+
+    @staticmethod
+    def _spill_size(entry: _Artifact) -> int:
+        _, mode, (width, height) = entry.spill
+        return width * height * len(mode)
+
+    @staticmethod
+    def _map(spill_path: str, mode: str, size) -> Image.Image:
+        with open(spill_path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return Image.frombuffer(mode, size, mapped, "raw", mode, 0, 1)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+        if entry.spill:
+            self._spill_bytes -= self._spill_size(entry)
+            try:
+                os.remove(entry.spill[0])
+            except OSError:
+                pass
+
+
+# Process-wide store shared by all ImageProcessor instances
+artifact_store = ArtifactStore(
+    max_bytes=int(os.environ.get("ARTIFACT_MEMORY_BYTES", str(256 * 1024 * 1024))),
+    spill_dir=os.environ.get("ARTIFACT_SPILL_DIR"),
+    max_spill_bytes=int(os.environ.get("ARTIFACT_SPILL_BYTES", str(1024 * 1024 * 1024)))
+)
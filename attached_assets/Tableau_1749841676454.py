@@ -4,7 +4,7 @@ from PIL import Image, ImageTk
 from pdf2image import convert_from_path
 from PyPDF2 import PdfMerger
 from datetime import datetime
-import json, os, requests, subprocess, shutil
+import json, os, requests, subprocess, shutil, time
 
 # Tableau credentials (set after login)
 TABLEAU_SERVER = "https://us-east-1.online.tableau.com"
@@ -12,10 +12,19 @@ TABLEAU_SITE = "your-site-name"
 USERNAME = ""
 PASSWORD = ""
 
+# Reuse a sign-in token until shortly before Tableau expires it (120 min by default)
+TOKEN_TTL_SECONDS = 110 * 60
+_auth_cache = {}
+
 # ----------------------------------------------
 # AUTH + API HELPERS
 # ----------------------------------------------
-def get_auth_token():
+def get_auth_token(force=False):
+    key = (TABLEAU_SERVER, TABLEAU_SITE, USERNAME)
+    cached = _auth_cache.get(key)
+    if cached and not force and time.time() - cached['issued_at'] < TOKEN_TTL_SECONDS:
+        return cached['token'], cached['site_id'], cached['user_id']
+
     url = f"{TABLEAU_SERVER}/api/3.20/auth/signin"
     payload = {
         "credentials": {
@@ -31,6 +40,7 @@ def get_auth_token():
     token = resp['credentials']['token']
     site_id = resp['credentials']['site']['id']
     user_id = resp['credentials']['user']['id']
+    _auth_cache[key] = {'token': token, 'site_id': site_id, 'user_id': user_id, 'issued_at': time.time()}
     return token, site_id, user_id
 
 def get_projects(token, site_id):
@@ -59,27 +69,6 @@ def get_views_in_workbook(token, site_id, workbook_id):
     response.raise_for_status()
     return response.json()["views"]["view"]
 
-# ----------------------------------------------
-# LOGIN AUTH
-# ----------------------------------------------
-def get_auth_token():
-    url = f"{TABLEAU_SERVER}/api/3.20/auth/signin"
-    payload = {
-        "credentials": {
-            "name": USERNAME,
-            "password": PASSWORD,
-            "site": {"contentUrl": TABLEAU_SITE}
-        }
-    }
-    headers = {"Content-Type": "application/json", "Accept": "application/json"}
-    response = requests.post(url, json=payload, headers=headers)
-    response.raise_for_status()
-    resp = response.json()
-    token = resp['credentials']['token']
-    site_id = resp['credentials']['site']['id']
-    user_id = resp['credentials']['user']['id']
-    return token, site_id, user_id
-
 # ----------------------------------------------
 # MAIN APPLICATION
 # ----------------------------------------------
@@ -309,7 +298,7 @@ def on_login():
     PASSWORD = pass_var.get()
     TABLEAU_SITE = site_var.get()
     try:
-        get_auth_token()
+        get_auth_token(force=True)
         login_window.destroy()
         launch_main_app()
     except Exception as e:
@@ -0,0 +1,97 @@
+"""Compare rasterizer backends on real exported PDFs.
+
+Renders go through ImageProcessor.pdf_to_png, the call the app makes, so
+with the artifact store enabled (ARTIFACT_MEMORY_BYTES, as in the app) the
+backends' in-memory render_images() path is what gets timed. Each backend
+runs in its own subprocess so peak memory figures are not polluted by the
+other backend:
+
+    python benchmark_rasterizers.py                      # uploads/*.pdf, all backends
+    python benchmark_rasterizers.py --repeat 5 --dpi 300 path/to/a.pdf
+"""
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+
+
+def run_worker(backend, pdf_paths, repeat, dpi):
+    """Rasterize every PDF repeat times with one backend and print a JSON summary"""
+    from artifact_store import artifact_store
+    from image_processor import ImageProcessor
+
+    processor = ImageProcessor(backend)
+    timings = []
+    output_bytes = 0
+    work_dir = tempfile.mkdtemp(prefix=f"raster_{backend}_")
+    try:
+        for n, pdf_path in enumerate(pdf_paths):
+            for i in range(repeat):
+                # pdf_to_png writes next to its input, so render from copies in work_dir
+                source_path = shutil.copyfile(pdf_path, os.path.join(work_dir, f"export_{n}_{i}.pdf"))
+                started = time.perf_counter()
+                png_path = processor.pdf_to_png(source_path, dpi=dpi)
+                timings.append(time.perf_counter() - started)
+                # Encoded size on disk, or the bitmap size while it is held in memory
+                output_bytes = max(output_bytes, artifact_store.size(png_path))
+                artifact_store.discard(png_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps({
+        "backend": backend,
+        "renders": len(timings),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "p95_ms": round(sorted(timings)[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 1),
+        "artifact_store": artifact_store.enabled,
+        "max_output_bytes": output_bytes,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "child_peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", help="PDFs to render (default: uploads/*.pdf)")
+    parser.add_argument("--backends", default="poppler,pdfium", help="Comma-separated backend names")
+    parser.add_argument("--repeat", type=int, default=3, help="Renders per PDF")
+    parser.add_argument("--dpi", type=int, default=int(os.environ.get("RASTER_DPI", "200")))
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    pdf_paths = args.pdfs or sorted(glob.glob(os.path.join("uploads", "*.pdf")))
+    if not pdf_paths:
+        sys.exit("No PDFs found; pass paths or export some dashboards into uploads/ first")
+
+    if args.worker:
+        run_worker(args.worker, pdf_paths, args.repeat, args.dpi)
+        return
+
+    print(f"{len(pdf_paths)} PDFs x {args.repeat} renders at {args.dpi} DPI")
+    print(f"{'backend':<10}{'median ms':>12}{'p95 ms':>10}{'peak RSS KiB':>15}{'child RSS KiB':>15}")
+    for backend in args.backends.split(","):
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend,
+             "--repeat", str(args.repeat), "--dpi", str(args.dpi), *pdf_paths],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "failed"
+            print(f"{backend:<10} {error}")
+            continue
+
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{backend:<10}{stats['median_ms']:>12}{stats['p95_ms']:>10}"
+              f"{stats['peak_rss_kb']:>15}{stats['child_peak_rss_kb']:>15}")
+
+
+if __name__ == "__main__":
+    main()
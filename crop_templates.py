@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+CROP_KEYS = ("x", "y", "width", "height")
+
+
+class CropTemplateStore:
+    """Saved crop rectangles per Tableau view, kept in a small JSON file.
+
+    Rectangles are stored as fractions of the image width and height, so a
+    crop drawn on one export (or on the downscaled crop preview) applies to
+    the next export of the same view whatever its DPI or resolution.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._templates = None
+        self._mtime = None
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # Re-read when another worker process has rewritten the file
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if self._templates is None or mtime != self._mtime:
+            self._mtime = mtime
+            try:
+                with open(self.path, "r") as f:
+                    self._templates = json.load(f)
+            except FileNotFoundError:
+                self._templates = {}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Ignoring unreadable crop templates {self.path}: {str(e)}")
+                self._templates = {}
+        return self._templates
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._templates, f, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def get(self, view_id: str) -> Optional[Dict[str, float]]:
+        """The saved fractional rectangle for a view, or None"""
+        with self._lock:
+            template = self._load().get(view_id)
+            return {key: template[key] for key in CROP_KEYS} if template else None
+
+    def save(self, view_id: str, crop_data: Dict[str, float], frame_size: Tuple[int, int]):
+        """Remember a crop drawn in frame_size pixels as fractions of the frame"""
+        frame_width, frame_height = frame_size
+        left = min(max(float(crop_data["x"]) / frame_width, 0.0), 1.0)
+        top = min(max(float(crop_data["y"]) / frame_height, 0.0), 1.0)
+        right = min(max((float(crop_data["x"]) + float(crop_data["width"])) / frame_width, left), 1.0)
+        bottom = min(max((float(crop_data["y"]) + float(crop_data["height"])) / frame_height, top), 1.0)
+
+        template = {
+            "x": round(left, 6),
+            "y": round(top, 6),
+            "width": round(right - left, 6),
+            "height": round(bottom - top, 6),
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        with self._lock:
+            self._load()[view_id] = template
+            self._save()
+        logging.info(f"Saved crop template for view {view_id}")
+
+    def delete(self, view_id: str) -> bool:
+        with self._lock:
+            if self._load().pop(view_id, None) is None:
+                return False
+            self._save()
+        return True
+
+    @staticmethod
+    def to_pixels(template: Dict[str, float], image_size: Tuple[int, int]) -> Dict[str, int]:
+        """Scale a fractional rectangle to an image of image_size pixels"""
+        width, height = image_size
+        x = round(template["x"] * width)
+        y = round(template["y"] * height)
+        return {
+            "x": x,
+            "y": y,
+            "width": max(1, min(round((template["x"] + template["width"]) * width), width) - x),
+            "height": max(1, min(round((template["y"] + template["height"]) * height), height) - y),
+        }
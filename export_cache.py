@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+
+class ExportCache:
+    """Content-addressed on-disk cache of exported dashboard files.
+
+    Entries are keyed by a hash of the requesting (server, site, user), the
+    view id, the export options and the view/workbook ``updatedAt`` stamps
+    from REST metadata, so a republished workbook naturally misses and one
+    user never gets another's render (row-level security and user filters
+    make renders user-specific). Each entry holds one file per kind (``pdf``,
+    ``png``) and is evicted least-recently-used once the directory grows past
+    ``max_bytes``. ``max_age`` bounds how long an entry is trusted, because
+    live data sources can change without touching ``updatedAt``.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, max_age: float = 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(namespace: Iterable[Optional[str]], view_id: str, options: Dict[str, Any],
+                 versions: Iterable[Optional[str]]) -> str:
+        """Build the content address for a view export as seen by namespace (server, site, user)"""
+        material = json.dumps({
+            "namespace": list(namespace),
+            "view_id": view_id,
+            "options": options,
+            "versions": list(versions)
+        }, sort_keys=True)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str, kind: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{kind}")
+
+    def get(self, key: str, kinds: Iterable[str], destination_dir: str, base_name: str,
+            optional_kinds: Iterable[str] = ()) -> Optional[Dict[str, str]]:
+        """Materialize a cached entry into destination_dir as base_name.<kind>.
+
+        Returns a mapping of kind to the new path, or None on a miss (any of
+        kinds missing); optional_kinds are included when cached. Files are
+        hard-linked where possible so a hit costs no copy.
+        """
+        if not self.enabled:
+            return None
+
+        entry_paths = {kind: self._entry_path(key, kind) for kind in kinds}
+        now = time.time()
+
+        with self._lock:
+            if not all(self._is_fresh(path, now) for path in entry_paths.values()):
+                self.misses += 1
+                return None
+            for kind in optional_kinds:
+                path = self._entry_path(key, kind)
+                if self._is_fresh(path, now):
+                    entry_paths[kind] = path
+
+            materialized = {}
+            for kind, path in entry_paths.items():
+                target = os.path.join(destination_dir, f"{base_name}.{kind}")
+                try:
+                    os.link(path, target)
+                except OSError:
+                    shutil.copyfile(path, target)
+                os.utime(path, (now, os.path.getmtime(path)))
+                materialized[kind] = target
+
+            self.hits += 1
+
+        logging.info(f"Export cache hit for {key[:12]}")
+        return materialized
+
+    def _is_fresh(self, path: str, now: float) -> bool:
+        try:
+            stored_at = os.path.getmtime(path)
+        except OSError:
+            return False
+        return self.max_age <= 0 or now - stored_at <= self.max_age
+
+    def put(self, key: str, files: Dict[str, str]):
+        """Store exported files (kind -> path) under key and enforce the size bound;
+        kinds whose path is None or not on disk are skipped"""
+        if not self.enabled:
+            return
+
+        os.makedirs(os.path.join(self.cache_dir, key[:2]), exist_ok=True)
+        for kind, path in files.items():
+            if not path or not os.path.exists(path):
+                continue
+            entry_path = self._entry_path(key, kind)
+            temp_path = f"{entry_path}.{threading.get_ident()}.tmp"
+            shutil.copyfile(path, temp_path)
+            os.replace(temp_path, entry_path)
+
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least-recently-used files until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for root, _, names in os.walk(self.cache_dir):
+                for name in names:
+                    if name.endswith(".tmp"):
+                        continue
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((stat.st_atime, stat.st_size, path))
+                    total += stat.st_size
+
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+
+            self.evictions += removed
+            self._bytes = total
+
+        if removed:
+            logging.info(f"Evicted {removed} files from export cache")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and disk usage"""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,56 +1,169 @@
+import io
 import os
 import logging
+import numpy as np
 from PIL import Image
-from pdf2image import convert_from_path
-from PyPDF2 import PdfMerger
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import RectangleObject
+import instrumentation
+from rasterizers import get_rasterizer
+from artifact_store import artifact_store, PNG_COMPRESS_LEVEL
+from pdf_writer import StreamingPdfWriter
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from typing import List, Dict, Any
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Tuple
 import tempfile
+import time
 from datetime import datetime
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Rasterization defaults, overridable per call
+RASTER_DPI = int(os.environ.get("RASTER_DPI", "200"))
+RASTER_THREADS = int(os.environ.get("RASTER_THREADS", "1"))
+
+# Output profiles for combined reports: target DPI at the placed size (None keeps
+# full resolution), encoding (png, png_optimized or jpeg) and optional palette size
+OUTPUT_PROFILES = {
+    'screen': {'dpi': 96, 'encoding': 'png_optimized', 'colors': 64},
+    'print': {'dpi': 200, 'encoding': 'jpeg', 'quality': 90},
+    'archive': {'dpi': None, 'encoding': 'png'},
+}
+# Profile used when a request does not name one; unset keeps images as they are
+DEFAULT_OUTPUT_PROFILE = os.environ.get("OUTPUT_PROFILE") or None
+# Width (px) of the downscaled preview shown in the crop UI
+PREVIEW_MAX_WIDTH = int(os.environ.get("PREVIEW_MAX_WIDTH", "1200"))
+# Auto-crop: detection runs on images reduced to about this width
+AUTO_CROP_WIDTH = 800
+# Per-channel distance from the background colour that counts as content
+AUTO_CROP_TOLERANCE = int(os.environ.get("AUTO_CROP_TOLERANCE", "12"))
+# Title/footer bands thinner than this fraction of the content height are trimmed (0 keeps them)
+AUTO_CROP_BAND_FRACTION = float(os.environ.get("AUTO_CROP_BAND_FRACTION", "0.08"))
+# Margin (full-resolution px) left around the detected content
+AUTO_CROP_PADDING = int(os.environ.get("AUTO_CROP_PADDING", "8"))
+# DPI Word pictures are resampled to at their placed size when no profile is given (0 embeds originals)
+WORD_IMAGE_DPI = int(os.environ.get("WORD_IMAGE_DPI", "150"))
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    """Take what has been written to buffer so far and empty it"""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
 class ImageProcessor:
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None):
         self.temp_files = []
+        # Rasterizer backend (poppler or pdfium), RASTER_BACKEND by default
+        self.rasterizer = get_rasterizer(backend)
+        # Rasterization timing/memory reports keyed by the first output path
+        self.reports = {}
+        # Encoded Word pictures for the document being built, keyed by (path, width, profile)
+        self._pictures = {}
+    
+    def pdf_to_png(self, pdf_path: str, dpi: Optional[int] = None, page: int = 1,
+                   compress_level: Optional[int] = None) -> str:
+        """Convert one page of a PDF (the first by default) to a PNG image"""
+        return self.pdf_to_pngs(pdf_path, first_page=page, last_page=page, dpi=dpi,
+                                compress_level=compress_level)[0]
     
-    def pdf_to_png(self, pdf_path: str, dpi: int = 200) -> str:
-        """Convert PDF to PNG image"""
+    def pdf_to_pngs(self, pdf_path: str, first_page: int = 1, last_page: Optional[int] = None,
+                    dpi: Optional[int] = None, thread_count: Optional[int] = None,
+                    compress_level: Optional[int] = None) -> List[str]:
+        """Rasterize a page range of a PDF straight to PNG files next to it.
+
+        Only the requested pages are rendered, by the configured rasterizer
+        backend (see rasterizers.py). With the artifact store enabled the
+        bitmaps are kept in memory under these paths instead of being encoded.
+        A timing/peak-memory report is kept in self.reports[first_png_path].
+        """
+        started = time.perf_counter()
+        dpi = dpi or RASTER_DPI
+        thread_count = thread_count or RASTER_THREADS
+        compress_level = PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+        instrumentation.emit("rasterize", state="start", file=os.path.basename(pdf_path), dpi=dpi)
+        
         try:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path, dpi=dpi)
-            
-            if not images:
-                raise Exception("No images found in PDF")
-            
-            # Use the first page
-            image = images[0]
-            
-            # Generate PNG filename
             base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-            png_path = os.path.join(os.path.dirname(pdf_path), f"{base_name}.png")
+            output_dir = os.path.dirname(pdf_path) or '.'
+            
+            if artifact_store.enabled:
+                images = self.rasterizer.render_images(pdf_path, first_page, last_page, dpi, thread_count)
+                png_paths = []
+                for page_number, image in enumerate(images, start=first_page):
+                    suffix = "" if len(images) == 1 else f"-{page_number}"
+                    png_path = os.path.join(output_dir, f"{base_name}{suffix}.png")
+                    png_paths.append(artifact_store.put_image(png_path, image, dpi=dpi,
+                                                              compress_level=compress_level))
+            else:
+                png_paths = self.rasterizer.render(
+                    pdf_path,
+                    output_dir,
+                    base_name,
+                    first_page=first_page,
+                    last_page=last_page,
+                    dpi=dpi,
+                    thread_count=thread_count,
+                    compress_level=compress_level
+                )
+                for png_path in png_paths:
+                    artifact_store.set_dpi(png_path, dpi)
+            
+            if not png_paths:
+                raise Exception("No images found in PDF")
             
-            # Save as PNG
-            image.save(png_path, "PNG")
+            report = self._rasterize_report(started, png_paths, dpi)
+            self.reports[png_paths[0]] = report
+            instrumentation.emit("rasterize", state="end", file=os.path.basename(pdf_path), dpi=dpi,
+                                 seconds=report['seconds'], pages=report['pages'], bytes=report['output_bytes'])
             
-            logging.info(f"Successfully converted PDF to PNG: {png_path}")
-            return png_path
+            logging.info(f"Successfully converted PDF to PNG: {png_paths[0]} ({report})")
+            return png_paths
             
         except Exception as e:
             logging.error(f"Failed to convert PDF to PNG: {str(e)}")
             raise Exception(f"PDF conversion failed: {str(e)}")
     
-    def crop_image(self, image_path: str, crop_data: Dict[str, float]) -> str:
-        """Crop an image based on crop coordinates"""
+    def _rasterize_report(self, started: float, png_paths: List[str], dpi: int) -> Dict[str, Any]:
+        """Timing and memory figures for sizing workers.
+
+        Peak RSS values are process high-water marks (KiB on Linux): peak_rss_kb
+        for this worker and child_peak_rss_kb for the largest pdftoppm it ran."""
+        report = {
+            'backend': self.rasterizer.name,
+            'seconds': round(time.perf_counter() - started, 3),
+            'pages': len(png_paths),
+            'dpi': dpi,
+            'output_bytes': sum(artifact_store.size(path) for path in png_paths)
+        }
+        if resource is not None:
+            report['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            report['child_peak_rss_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        return report
+    
+    def crop_image(self, image_path: str, crop_data: Dict[str, float],
+                   frame_size: Optional[Tuple[int, int]] = None) -> str:
+        """Crop an image based on crop coordinates.
+
+        frame_size is the (width, height) of the image the selection was drawn
+        on (e.g. the crop preview); coordinates are scaled from it to full size."""
+        started = time.perf_counter()
         try:
-            image = Image.open(image_path)
+            image = artifact_store.get_image(image_path)
+            
+            scale_x = image.width / frame_size[0] if frame_size else 1.0
+            scale_y = image.height / frame_size[1] if frame_size else 1.0
             
             # Extract crop coordinates
-            x1 = int(crop_data['x'])
-            y1 = int(crop_data['y'])
-            x2 = int(crop_data['x'] + crop_data['width'])
-            y2 = int(crop_data['y'] + crop_data['height'])
+            x1 = round(crop_data['x'] * scale_x)
+            y1 = round(crop_data['y'] * scale_y)
+            x2 = round((crop_data['x'] + crop_data['width']) * scale_x)
+            y2 = round((crop_data['y'] + crop_data['height']) * scale_y)
             
             # Ensure coordinates are within image bounds
             x1 = max(0, min(x1, image.width))
@@ -69,8 +182,10 @@ class ImageProcessor:
             base_name = os.path.splitext(os.path.basename(image_path))[0]
             cropped_path = os.path.join(os.path.dirname(image_path), f"{base_name}_cropped.png")
             
-            # Save cropped image
-            cropped_image.save(cropped_path, "PNG")
+            # Keep the cropped image in the artifact store; it is encoded once, by the final output
+            artifact_store.put_image(cropped_path, cropped_image, dpi=artifact_store.get_dpi(image_path))
+            instrumentation.emit("crop", state="end", kind="raster", file=os.path.basename(image_path),
+                                 seconds=round(time.perf_counter() - started, 3), size=list(cropped_image.size))
             
             logging.info(f"Successfully cropped image: {cropped_path}")
             return cropped_path
@@ -79,65 +194,288 @@ class ImageProcessor:
             logging.error(f"Failed to crop image: {str(e)}")
             raise Exception(f"Image cropping failed: {str(e)}")
     
-    def combine_to_pdf(self, image_paths: List[str], output_dir: str, filename: str) -> str:
-        """Combine multiple images into a single PDF"""
+    def crop_pdf(self, pdf_path: str, crop_data: Dict[str, float], image_size: Tuple[int, int], page: int = 1) -> str:
+        """Crop a PDF page itself, keeping its vector content.
+
+        crop_data is in pixels of the page's raster (image_size = width, height),
+        so it is scaled to PDF points over the page's crop box with the y axis
+        flipped (PDF origin is bottom-left). The result is a one-page PDF whose
+        media and crop boxes are the selected area.
+        """
+        started = time.perf_counter()
         try:
-            output_path = os.path.join(output_dir, f"{filename}.pdf")
+            reader = PdfReader(pdf_path)
+            pdf_page = reader.pages[page - 1]
             
-            # Convert images to PDF
-            temp_pdfs = []
-            merger = PdfMerger()
+            if pdf_page.rotation % 360:
+                raise Exception("Rotated pages are not supported")
             
-            for i, image_path in enumerate(image_paths):
-                if not os.path.exists(image_path):
-                    logging.warning(f"Image not found: {image_path}")
+            box = pdf_page.cropbox
+            left, bottom, right, top = float(box.left), float(box.bottom), float(box.right), float(box.top)
+            scale_x = (right - left) / image_size[0]
+            scale_y = (top - bottom) / image_size[1]
+            
+            # Clamp to the page the same way crop_image clamps to the raster
+            x1 = max(0.0, min(crop_data['x'], image_size[0]))
+            y1 = max(0.0, min(crop_data['y'], image_size[1]))
+            x2 = max(0.0, min(crop_data['x'] + crop_data['width'], image_size[0]))
+            y2 = max(0.0, min(crop_data['y'] + crop_data['height'], image_size[1]))
+            
+            if x2 <= x1 or y2 <= y1:
+                raise Exception("Invalid crop coordinates")
+            
+            crop_box = RectangleObject([round(value, 3) for value in (
+                left + x1 * scale_x,
+                top - y2 * scale_y,
+                left + x2 * scale_x,
+                top - y1 * scale_y
+            )])
+            pdf_page.mediabox = crop_box
+            pdf_page.cropbox = crop_box
+            
+            writer = PdfWriter()
+            writer.add_page(pdf_page)
+            
+            base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+            cropped_path = os.path.join(os.path.dirname(pdf_path), f"{base_name}_cropped.pdf")
+            with open(cropped_path, 'wb') as f:
+                writer.write(f)
+            instrumentation.emit("crop", state="end", kind="vector", file=os.path.basename(pdf_path),
+                                 seconds=round(time.perf_counter() - started, 3))
+            
+            logging.info(f"Successfully cropped PDF page: {cropped_path}")
+            return cropped_path
+            
+        except Exception as e:
+            logging.error(f"Failed to crop PDF: {str(e)}")
+            raise Exception(f"PDF cropping failed: {str(e)}")
+    
+    def detect_content_box(self, image_path: str) -> Dict[str, float]:
+        """Crop rectangle (crop_image format) around an image's content"""
+        return self.detect_content_boxes([image_path])[0]
+    
+    def detect_content_boxes(self, image_paths: List[str]) -> List[Dict[str, float]]:
+        """Find the content bounding box of a batch of dashboards in one vectorized pass.
+
+        Each image is reduced to about AUTO_CROP_WIDTH and the batch is stacked
+        into one array, padded with each image's own background colour (the
+        most common colour on its border). Pixels further than AUTO_CROP_TOLERANCE from it
+        are content, except uniform full-width bars (toolbars and other chrome).
+        Margins are trimmed to the content, then thin bands separated by
+        whitespace at the top and bottom (title bars, footers) are dropped.
+        """
+        started = time.perf_counter()
+        try:
+            reduced = []
+            sizes = []
+            for image_path in image_paths:
+                image = artifact_store.get_image(image_path)
+                factor = max(1, -(-image.width // AUTO_CROP_WIDTH))
+                small = image.convert('RGB')
+                if factor > 1:
+                    small = small.reduce(factor)
+                reduced.append(np.asarray(small))
+                sizes.append(image.size)
+            
+            count = len(reduced)
+            height = max(array.shape[0] for array in reduced)
+            width = max(array.shape[1] for array in reduced)
+            
+            background = np.stack([self._border_color(array) for array in reduced]).astype(np.int16)[:, None, None, :]
+            
+            batch = np.empty((count, height, width, 3), dtype=np.int16)
+            batch[:] = background
+            for i, array in enumerate(reduced):
+                batch[i, :array.shape[0], :array.shape[1]] = array
+            
+            # (N, H, W): pixel differs from its image's background
+            content = (np.abs(batch - background).max(axis=3) > AUTO_CROP_TOLERANCE)
+            
+            # (N, H): rows that are almost entirely non-background but flat, i.e. chrome
+            # bars; measured over each image's own columns, not the padding
+            widths = np.array([array.shape[1] for array in reduced])
+            padding = (np.arange(width)[None, :] >= widths[:, None])[:, None, :]
+            flat = ((np.abs(batch - batch[:, :, :1]).max(axis=3) <= 2) | padding).all(axis=2)
+            chrome = (content.sum(axis=2) > 0.95 * widths[:, None]) & flat
+            content &= ~chrome[:, :, None]
+            
+            row_has_content = content.any(axis=2)
+            
+            boxes = []
+            for i, (full_width, full_height) in enumerate(sizes):
+                rows = np.flatnonzero(row_has_content[i])
+                if rows.size == 0:
+                    boxes.append({'x': 0, 'y': 0, 'width': full_width, 'height': full_height})
                     continue
                 
-                # Open and convert image to RGB if necessary
-                image = Image.open(image_path)
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
+                top, bottom = self._trim_bands(rows, reduced[i].shape[0])
+                cols = np.flatnonzero(content[i, top:bottom + 1].any(axis=0))
+                left, right = cols[0], cols[-1]
                 
-                # Create temporary PDF for this image
-                temp_pdf_path = os.path.join(output_dir, f"temp_{i}.pdf")
-                image.save(temp_pdf_path, "PDF")
-                temp_pdfs.append(temp_pdf_path)
-                
-                # Add to merger
-                merger.append(temp_pdf_path)
-            
-            if not temp_pdfs:
-                raise Exception("No valid images to combine")
+                scale_x = full_width / reduced[i].shape[1]
+                scale_y = full_height / reduced[i].shape[0]
+                x1 = max(0, int(left * scale_x) - AUTO_CROP_PADDING)
+                y1 = max(0, int(top * scale_y) - AUTO_CROP_PADDING)
+                x2 = min(full_width, int(np.ceil((right + 1) * scale_x)) + AUTO_CROP_PADDING)
+                y2 = min(full_height, int(np.ceil((bottom + 1) * scale_y)) + AUTO_CROP_PADDING)
+                boxes.append({'x': x1, 'y': y1, 'width': x2 - x1, 'height': y2 - y1})
+            
+            instrumentation.emit("crop", state="end", kind="detect", images=count,
+                                 seconds=round(time.perf_counter() - started, 3))
+            logging.info(f"Detected content boxes for {count} images")
+            return boxes
             
-            # Write combined PDF
-            merger.write(output_path)
-            merger.close()
-            
-            # Clean up temporary PDFs
-            for temp_pdf in temp_pdfs:
-                try:
-                    os.remove(temp_pdf)
-                except:
-                    pass
+        except Exception as e:
+            logging.error(f"Failed to detect content boxes: {str(e)}")
+            raise Exception(f"Auto-crop failed: {str(e)}")
+    
+    def _border_color(self, array: np.ndarray) -> np.ndarray:
+        """Most common RGB colour along an image's edges"""
+        border = np.concatenate((array[0], array[-1], array[:, 0], array[:, -1])).astype(np.uint32)
+        packed = (border[:, 0] << 16) | (border[:, 1] << 8) | border[:, 2]
+        values, counts = np.unique(packed, return_counts=True)
+        color = int(values[counts.argmax()])
+        return np.array([(color >> 16) & 255, (color >> 8) & 255, color & 255])
+    
+    def _trim_bands(self, rows: np.ndarray, image_height: int) -> Tuple[int, int]:
+        """(top, bottom) content rows after dropping thin title/footer bands"""
+        # Split content rows into bands separated by whitespace gaps
+        gap = max(3, image_height // 100)
+        breaks = np.flatnonzero(np.diff(rows) > gap)
+        starts = np.concatenate(([rows[0]], rows[breaks + 1]))
+        ends = np.concatenate((rows[breaks], [rows[-1]]))
+        
+        first, last = 0, len(starts) - 1
+        min_band = AUTO_CROP_BAND_FRACTION * (rows[-1] - rows[0] + 1)
+        if last > first and ends[first] - starts[first] + 1 < min_band:
+            first += 1
+        if last > first and ends[last] - starts[last] + 1 < min_band:
+            last -= 1
+        return int(starts[first]), int(ends[last])
+    
+    def combine_to_pdf(self, image_paths: List[str], output_dir: str, filename: str,
+                       profile: Optional[str] = None) -> str:
+        """Combine multiple images into a single PDF file (see stream_pdf)"""
+        output_path = os.path.join(output_dir, f"{filename}.pdf")
+        chunks = self.stream_pdf(image_paths, profile)
+        with open(output_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        logging.info(f"Successfully created combined PDF: {output_path}")
+        return output_path
+    
+    def stream_pdf(self, image_paths: List[str], profile: Optional[str] = None) -> Iterator[bytes]:
+        """Combine multiple images into a single PDF, yielding it in chunks as it is built.
+
+        Encoded PNG/JPEG files are embedded without re-encoding and each page
+        is yielded as soon as it is written, so only one page is held in memory
+        at a time (see pdf_writer.py). Paths ending in .pdf (vector crops) are
+        copied in as vector pages, without rasterization, and streamed the same
+        way. With a profile, pages keep the dashboard's physical size and images are
+        re-encoded once for that profile.
+
+        Missing images are checked before this returns, so callers can still
+        report that as an error; later failures are raised by the iterator."""
+        pages = []
+        for image_path in image_paths:
+            if not artifact_store.exists(image_path):
+                logging.warning(f"Image not found: {image_path}")
+                continue
+            pages.append(image_path)
+        
+        if not pages:
+            logging.error("Failed to combine images to PDF: No valid images to combine")
+            raise Exception("PDF combination failed: No valid images to combine")
+        return self._pdf_chunks(pages, profile)
+    
+    def _pdf_chunks(self, pages: List[str], profile: Optional[str]) -> Iterator[bytes]:
+        started = time.perf_counter()
+        try:
+            instrumentation.emit("assemble", state="start", format="pdf", total=len(pages))
+            buffer = io.BytesIO()
+            writer = StreamingPdfWriter(buffer)
+            for number, page in enumerate(pages, start=1):
+                if page.lower().endswith('.pdf'):
+                    writer.add_pdf_page(page)
+                else:
+                    writer.add_image(**self._pdf_image_source(page, profile))
+                instrumentation.emit("assemble", state="progress", format="pdf", pages=number,
+                                     total=len(pages), bytes=writer.position)
+                yield _drain(buffer)
+            writer.close()
+            yield _drain(buffer)
             
-            logging.info(f"Successfully created combined PDF: {output_path}")
-            return output_path
+            instrumentation.emit("assemble", state="end", format="pdf", pages=len(pages),
+                                 seconds=round(time.perf_counter() - started, 3), bytes=writer.position)
             
         except Exception as e:
             logging.error(f"Failed to combine images to PDF: {str(e)}")
             raise Exception(f"PDF combination failed: {str(e)}")
     
-    def combine_to_word(self, image_paths: List[str], output_dir: str, filename: str) -> str:
+    def _pdf_image_source(self, image_path: str, profile: Optional[str] = None) -> Dict[str, Any]:
+        """Encoded bytes for passthrough when they exist, otherwise the in-memory bitmap.
+
+        Either way the page is sized to the dashboard's physical size: its pixels
+        at the density it was rendered at, like vector pages copied from PDFs."""
+        source_dpi = artifact_store.get_dpi(image_path) or RASTER_DPI
+        if profile:
+            placed_width = artifact_store.get_size(image_path)[0] / source_dpi
+            data, dpi = self.encode_for_profile(image_path, profile, placed_width)
+            return {'data': data, 'dpi': dpi}
+        
+        encoded = artifact_store.get_encoded(image_path)
+        if encoded is not None:
+            return {'data': encoded, 'dpi': source_dpi}
+        return {'image': artifact_store.get_image(image_path), 'dpi': source_dpi}
+    
+    def encode_for_profile(self, image_path: str, profile: str, placed_width_inches: float) -> Tuple[bytes, float]:
+        """Encode an image for an output profile at its placed width.
+
+        Returns the encoded bytes and their resulting DPI. Images are only ever
+        downsampled, and palette quantization (no dithering) suits the flat
+        colours of Tableau dashboards."""
+        if profile not in OUTPUT_PROFILES:
+            raise Exception(f"Unknown output profile '{profile}'")
+        return self._encode_image(image_path, OUTPUT_PROFILES[profile], placed_width_inches)
+    
+    def _encode_image(self, image_path: str, settings: Dict[str, Any], placed_width_inches: float) -> Tuple[bytes, float]:
+        width, _ = artifact_store.get_size(image_path)
+        target_width = round(placed_width_inches * settings['dpi']) if settings['dpi'] else width
+        
+        if target_width >= width and settings['encoding'] == 'png' and not settings.get('colors'):
+            # Nothing to resample or re-encode; reuse the existing encoding
+            return artifact_store.get_bytes(image_path), width / placed_width_inches
+        
+        image = artifact_store.get_image(image_path)
+        if target_width < image.width:
+            target_height = max(1, round(image.height * target_width / image.width))
+            image = image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+        
+        buffer = io.BytesIO()
+        if settings['encoding'] == 'jpeg':
+            image.convert('RGB').save(buffer, "JPEG", quality=settings.get('quality', 85), optimize=True)
+        else:
+            if settings.get('colors'):
+                image = image.convert('RGB').quantize(colors=settings['colors'], method=Image.Quantize.FASTOCTREE,
+                                                      dither=Image.Dither.NONE)
+            image.save(buffer, "PNG", optimize=settings['encoding'] == 'png_optimized')
+        
+        return buffer.getvalue(), image.width / placed_width_inches
+    
+    def combine_to_word(self, image_paths: List[str], output_dir: str, filename: str,
+                        profile: Optional[str] = None) -> str:
         """Combine multiple images into a single Word document"""
+        started = time.perf_counter()
         try:
             output_path = os.path.join(output_dir, f"{filename}.docx")
+            instrumentation.emit("assemble", state="start", format="docx", total=len(image_paths))
             
             # Create new Word document
             doc = Document()
             doc.add_heading('Tableau Dashboard Export', 0)
             
             for i, image_path in enumerate(image_paths):
-                if not os.path.exists(image_path):
+                if not artifact_store.exists(image_path):
                     logging.warning(f"Image not found: {image_path}")
                     continue
                 
@@ -145,13 +483,12 @@ class ImageProcessor:
                 doc.add_heading(f'Dashboard {i + 1}', level=1)
                 
                 # Add image to document
-                # Calculate appropriate width (max 6 inches)
-                image = Image.open(image_path)
-                aspect_ratio = image.height / image.width
-                width = min(6.0, image.width / 100)  # Convert pixels to inches roughly
-                height = width * aspect_ratio
+                # Calculate appropriate width (max 6 inches) from the image header
+                image_width, _ = artifact_store.get_size(image_path)
+                width = min(6.0, image_width / 100)  # Convert pixels to inches roughly
                 
-                doc.add_picture(image_path, width=Inches(width))
+                doc.add_picture(self._picture_stream(image_path, width, profile), width=Inches(width))
+                instrumentation.emit("assemble", state="progress", format="docx", pages=i + 1, total=len(image_paths))
                 
                 # Add page break if not the last image
                 if i < len(image_paths) - 1:
@@ -159,6 +496,9 @@ class ImageProcessor:
             
             # Save document
             doc.save(output_path)
+            self._pictures.clear()
+            instrumentation.emit("assemble", state="end", format="docx", pages=len(image_paths),
+                                 seconds=round(time.perf_counter() - started, 3), bytes=os.path.getsize(output_path))
             
             logging.info(f"Successfully created Word document: {output_path}")
             return output_path
@@ -167,10 +507,21 @@ class ImageProcessor:
             logging.error(f"Failed to combine images to Word: {str(e)}")
             raise Exception(f"Word document creation failed: {str(e)}")
     
-    def combine_to_word_with_details(self, image_paths: List[str], output_dir: str, filename: str, summary_data: List[Dict]) -> str:
+    def combine_to_word_with_details(self, image_paths: List[str], output_dir: str, filename: str, summary_data: List[Dict],
+                                     profile: Optional[str] = None) -> str:
         """Combine multiple images into a single Word document with detailed metadata using 2-column layout"""
+        output_path = os.path.join(output_dir, f"{filename}.docx")
+        with open(output_path, 'wb') as f:
+            self.write_word_with_details(f, image_paths, summary_data, profile)
+        logging.info(f"Successfully created detailed Word document: {output_path}")
+        return output_path
+    
+    def write_word_with_details(self, stream: BinaryIO, image_paths: List[str], summary_data: List[Dict],
+                                profile: Optional[str] = None):
+        """Write the detailed Word document to a stream (a file, or a BytesIO to send without touching disk)"""
+        started = time.perf_counter()
         try:
-            output_path = os.path.join(output_dir, f"{filename}.docx")
+            instrumentation.emit("assemble", state="start", format="docx", total=len(image_paths))
             
             # Create new Word document
             doc = Document()
@@ -203,32 +554,35 @@ class ImageProcessor:
                 doc.add_heading(page_title, level=1)
                 
                 # First dashboard
-                self._add_dashboard_to_word(doc, image_paths[i], summary_data[i], i + 1)
+                self._add_dashboard_to_word(doc, image_paths[i], summary_data[i], i + 1, profile)
                 
                 # Second dashboard on same page (if exists)
                 if i + 1 < len(image_paths):
                     # Add some spacing between dashboards
                     doc.add_paragraph()
-                    self._add_dashboard_to_word(doc, image_paths[i + 1], summary_data[i + 1], i + 2)
+                    self._add_dashboard_to_word(doc, image_paths[i + 1], summary_data[i + 1], i + 2, profile)
+                instrumentation.emit("assemble", state="progress", format="docx", pages=min(i + 2, len(image_paths)),
+                                     total=len(image_paths))
                 
                 # Add page break if not the last pair
                 if i + 2 < len(image_paths):
                     doc.add_page_break()
             
             # Save document
-            doc.save(output_path)
-            
-            logging.info(f"Successfully created detailed Word document: {output_path}")
-            return output_path
+            doc.save(stream)
+            self._pictures.clear()
+            instrumentation.emit("assemble", state="end", format="docx", pages=len(image_paths),
+                                 seconds=round(time.perf_counter() - started, 3), bytes=stream.tell())
             
         except Exception as e:
             logging.error(f"Failed to combine images to Word with details: {str(e)}")
             raise Exception(f"Detailed Word document creation failed: {str(e)}")
     
-    def _add_dashboard_to_word(self, doc, image_path: str, data: Dict, section_num: int):
+    def _add_dashboard_to_word(self, doc, image_path: str, data: Dict, section_num: int,
+                               profile: Optional[str] = None):
         """Add a single dashboard to Word document with 2-column layout"""
         try:
-            if not os.path.exists(image_path):
+            if not artifact_store.exists(image_path):
                 logging.warning(f"Image not found: {image_path}")
                 return
             
@@ -245,16 +599,11 @@ class ImageProcessor:
             left_para = left_cell.paragraphs[0]
             
             # Add image to left cell
-            image = Image.open(image_path)
-            img_width = image.width
-            img_height = image.height
-            aspect_ratio = img_height / img_width
-            
             # Set image width to fit in left column (3 inches max)
             img_width_inches = 3.0
             
             run = left_para.runs[0] if left_para.runs else left_para.add_run()
-            run.add_picture(image_path, width=Inches(img_width_inches))
+            run.add_picture(self._picture_stream(image_path, img_width_inches, profile), width=Inches(img_width_inches))
             
             # Right column - Metadata
             right_cell = table.rows[0].cells[1]
@@ -290,10 +639,53 @@ class ImageProcessor:
             error_para = doc.add_paragraph()
             error_para.add_run(f'[Error loading Dashboard {section_num}: {os.path.basename(image_path)}]').italic = True
     
+    def _picture_stream(self, image_path: str, placed_width_inches: float, profile: Optional[str] = None) -> io.BytesIO:
+        """Encoded image for a Word picture, resampled to its placed size.
+
+        Uses the profile's DPI and encoding, or WORD_IMAGE_DPI as lossless PNG.
+        Results are memoized per document, and python-docx stores identical
+        image bytes as a single package part, so repeated images cost nothing."""
+        key = (os.path.abspath(image_path), placed_width_inches, profile)
+        if key not in self._pictures:
+            if profile:
+                data, _ = self.encode_for_profile(image_path, profile, placed_width_inches)
+            elif WORD_IMAGE_DPI:
+                data, _ = self._encode_image(image_path, {'dpi': WORD_IMAGE_DPI, 'encoding': 'png'}, placed_width_inches)
+            else:
+                data = artifact_store.get_bytes(image_path)
+            self._pictures[key] = data
+        return io.BytesIO(self._pictures[key])
+    
+    def create_preview(self, image_path: str, max_width: Optional[int] = None) -> str:
+        """Create the downscaled image the crop UI draws on.
+
+        Returns image_path itself when the image is already small enough."""
+        try:
+            max_width = max_width or PREVIEW_MAX_WIDTH
+            width, height = artifact_store.get_size(image_path)
+            if width <= max_width:
+                return image_path
+            
+            preview_height = max(1, round(height * max_width / width))
+            preview = artifact_store.get_image(image_path).resize((max_width, preview_height),
+                                                                  Image.Resampling.LANCZOS)
+            
+            base_name = os.path.splitext(os.path.basename(image_path))[0]
+            preview_path = os.path.join(os.path.dirname(image_path), f"{base_name}_preview.png")
+            artifact_store.put_image(preview_path, preview)
+            
+            logging.info(f"Successfully created preview: {preview_path}")
+            return preview_path
+            
+        except Exception as e:
+            logging.error(f"Failed to create preview: {str(e)}")
+            raise Exception(f"Preview creation failed: {str(e)}")
+    
     def create_thumbnail(self, image_path: str, max_width: int = 200, max_height: int = 120) -> str:
         """Create a thumbnail of an image"""
         try:
-            image = Image.open(image_path)
+            # Copy so the stored full-size image is left untouched
+            image = artifact_store.get_image(image_path).copy()
             
             # Calculate thumbnail size maintaining aspect ratio
             image.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
@@ -302,8 +694,8 @@ class ImageProcessor:
             base_name = os.path.splitext(os.path.basename(image_path))[0]
             thumb_path = os.path.join(os.path.dirname(image_path), f"{base_name}_thumb.png")
             
-            # Save thumbnail
-            image.save(thumb_path, "PNG")
+            # Keep the thumbnail in the artifact store; it is encoded when served
+            artifact_store.put_image(thumb_path, image)
             
             logging.info(f"Successfully created thumbnail: {thumb_path}")
             return thumb_path
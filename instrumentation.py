@@ -0,0 +1,51 @@
+import time
+import logging
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Receives (stage, fields) for the work currently being done on behalf of a job
+_listener: contextvars.ContextVar = contextvars.ContextVar("instrumentation_listener", default=None)
+
+
+def emit(stage: str, **fields):
+    """Report a stage event (auth, download, rasterize, crop, assemble...) to the current listener, if any"""
+    listener = _listener.get()
+    if listener is None:
+        return
+    try:
+        listener(stage, fields)
+    except Exception as e:
+        logging.debug(f"Dropped {stage} event: {str(e)}")
+
+
+@contextmanager
+def stage(name: str, **fields) -> Iterator[Dict[str, Any]]:
+    """Emit start and end (or error) events around a block, with its duration.
+
+    The yielded dict can be filled in by the block (e.g. bytes, pages) and is
+    included in the end event."""
+    started = time.perf_counter()
+    emit(name, state="start", **fields)
+    try:
+        yield fields
+    except BaseException as e:
+        emit(name, state="error", seconds=round(time.perf_counter() - started, 3), error=str(e), **fields)
+        raise
+    emit(name, state="end", seconds=round(time.perf_counter() - started, 3), **fields)
+
+
+@contextmanager
+def listen(listener: Optional[Callable[[str, Dict[str, Any]], None]]):
+    """Send events from this context (and work propagated from it) to listener"""
+    token = _listener.set(listener)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+def propagate(func: Callable) -> Callable:
+    """Wrap func to run in a copy of the current context, so pool threads keep its listener"""
+    return functools.partial(contextvars.copy_context().run, func)
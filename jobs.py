@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import uuid
+import itertools
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import instrumentation
+
+FINISHED = ("done", "failed")
+
+
+class JobQueue:
+    """Runs slow work (exports, report assembly) off the request thread.
+
+    Jobs execute on an in-process thread pool; their status, progress and
+    JSON result are kept in a local SQLite file, so any worker process on the
+    host can answer status polls. Job functions are called as
+    func(progress, *args) where progress(done=None, total=None, message=None)
+    records how far they got, and must return something JSON-serializable.
+    Stage events the work emits through instrumentation (auth, download,
+    rasterize, crop, assemble) are recorded per job with their elapsed time,
+    for the progress stream. Jobs left queued or running by a process that no
+    longer exists are marked failed on start-up. Finished jobs are forgotten
+    after max_age seconds; on_expire(kind, result) is called for each one
+    that had a result, to delete files it refers to.
+    """
+
+    def __init__(self, path: str, workers: int = 2, max_age: float = 24 * 3600,
+                 on_expire: Optional[Callable[[str, Any], None]] = None):
+        self.path = path
+        self.max_age = max_age
+        self.on_expire = on_expire
+        self._last_purge = 0.0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.submitted = 0
+        self.failed = 0
+
+        db = self._connect()
+        db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                   "id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT, status TEXT NOT NULL, "
+                   "done INTEGER NOT NULL DEFAULT 0, total INTEGER NOT NULL DEFAULT 0, message TEXT, "
+                   "result TEXT, error TEXT, claimed INTEGER NOT NULL DEFAULT 0, pid INTEGER, "
+                   "created REAL NOT NULL, updated REAL NOT NULL)")
+        db.execute("CREATE TABLE IF NOT EXISTS job_events ("
+                   "job_id TEXT NOT NULL, seq INTEGER NOT NULL, stage TEXT NOT NULL, data TEXT NOT NULL, "
+                   "PRIMARY KEY (job_id, seq))")
+        self._fail_orphans()
+        self.purge()
+
+    def _connect(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def _fail_orphans(self):
+        db = self._connect()
+        for job_id, pid in db.execute("SELECT id, pid FROM jobs WHERE status IN ('queued', 'running')").fetchall():
+            try:
+                os.kill(pid, 0)
+                continue
+            except (OSError, TypeError):
+                pass
+            db.execute("UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                       ("Interrupted by a server restart", time.time(), job_id))
+
+    def submit(self, kind: str, owner: Optional[str], func: Callable, *args, total: int = 0) -> str:
+        """Queue func(progress, *args) and return the new job's id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, kind, owner, status, total, pid, created, updated) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?, ?)",
+            (job_id, kind, owner, total, os.getpid(), now, now))
+        self.submitted += 1
+        if self.submitted % 100 == 0 or now - self._last_purge > min(self.max_age, 3600):
+            self.purge()
+        self._pool.submit(self._run, job_id, func, args)
+        logging.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def _run(self, job_id: str, func: Callable, args):
+        self._update(job_id, status="running")
+        started = time.perf_counter()
+        sequence = itertools.count(1)
+        # Seconds spent per stage, from the stages' end events
+        stages: Dict[str, float] = {}
+
+        def listener(stage: str, fields: Dict[str, Any]):
+            if fields.get("state") == "end" and "seconds" in fields:
+                stages[stage] = round(stages.get(stage, 0.0) + fields["seconds"], 3)
+            event = dict(fields, elapsed=round(time.perf_counter() - started, 3))
+            self._connect().execute("INSERT INTO job_events (job_id, seq, stage, data) VALUES (?, ?, ?, ?)",
+                                    (job_id, next(sequence), stage, json.dumps(event)))
+
+        def progress(done: Optional[int] = None, total: Optional[int] = None, message: Optional[str] = None):
+            self._update(job_id, done=done, total=total, message=message)
+            instrumentation.emit("progress", **{key: value for key, value in
+                                                (("done", done), ("total", total), ("message", message))
+                                                if value is not None})
+
+        try:
+            with instrumentation.listen(listener):
+                result = func(progress, *args)
+                seconds = round(time.perf_counter() - started, 3)
+                instrumentation.emit("job", state="end", seconds=seconds, stages=dict(stages))
+            self._update(job_id, status="done", result=json.dumps(result))
+            logging.info(f"Job {job_id} finished in {seconds:.2f}s (stage seconds: {stages})")
+        except Exception as e:
+            self.failed += 1
+            logging.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, status="failed", error=str(e))
+
+    def _update(self, job_id: str, **fields):
+        fields = {key: value for key, value in fields.items() if value is not None}
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str, owner: Optional[str] = None, include_result: bool = True) -> Optional[Dict[str, Any]]:
+        """A job's status (and result once done), or None if it does not exist for owner"""
+        db = self._connect()
+        db.row_factory = sqlite3.Row
+        try:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            db.row_factory = None
+        if row is None or (owner is not None and row["owner"] != owner):
+            return None
+
+        job = {key: row[key] for key in ("id", "kind", "status", "done", "total", "message", "error",
+                                         "created", "updated")}
+        if include_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def events(self, job_id: str, after: int = 0) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """A job's stage events with sequence numbers above after, in order"""
+        rows = self._connect().execute(
+            "SELECT seq, stage, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after))
+        return [(seq, stage, json.loads(data)) for seq, stage, data in rows]
+
+    def claim(self, job_id: str) -> bool:
+        """True the first time a finished job's result is collected (to apply it exactly once)"""
+        return self._connect().execute(
+            "UPDATE jobs SET claimed = 1 WHERE id = ? AND status = 'done' AND claimed = 0", (job_id,)).rowcount == 1
+
+    def purge(self) -> int:
+        """Forget finished jobs older than max_age"""
+        self._last_purge = time.time()
+        db = self._connect()
+        expired = db.execute("SELECT id, kind, result FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                             (self._last_purge - self.max_age,)).fetchall()
+        for job_id, kind, result in expired:
+            if result and self.on_expire:
+                try:
+                    self.on_expire(kind, json.loads(result))
+                except Exception as e:
+                    logging.warning(f"Cleanup of expired job {job_id} failed: {str(e)}")
+            db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        if expired:
+            db.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT id FROM jobs)")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"submitted": self.submitted, "failed": self.failed, "by_status": counts}
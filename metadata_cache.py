@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Default time-to-live (seconds) for each kind of Tableau metadata
+DEFAULT_TTLS = {
+    "projects": float(os.environ.get("TABLEAU_CACHE_TTL_PROJECTS", "300")),
+    "workbooks": float(os.environ.get("TABLEAU_CACHE_TTL_WORKBOOKS", "120")),
+    "views": float(os.environ.get("TABLEAU_CACHE_TTL_VIEWS", "120")),
+    "view": float(os.environ.get("TABLEAU_CACHE_TTL_DETAILS", "30")),
+    "workbook": float(os.environ.get("TABLEAU_CACHE_TTL_DETAILS", "30")),
+}
+
+
+class MetadataCache:
+    """Thread-safe TTL + LRU cache for Tableau REST metadata.
+
+    Keys are tuples of (server, site, user, resource, identifier) so cached
+    listings are never shared between users with different permissions.
+    Memory is bounded both by entry count and by the approximate JSON size
+    of the cached values.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 8 * 1024 * 1024,
+                 ttls: Optional[Dict[str, float]] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple) -> Tuple[bool, Any]:
+        """Return (found, value) for a key, dropping it if it has expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def set(self, key: Tuple, value: Any):
+        """Store a value using the TTL configured for its resource type"""
+        resource = key[3]
+        ttl = self.ttls.get(resource, 60.0)
+        if ttl <= 0:
+            return
+
+        try:
+            size = len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            size = 0
+
+        if size > self.max_bytes:
+            logging.debug(f"Not caching {resource}: {size} bytes exceeds cache bound")
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key: Tuple, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader on a miss"""
+        found, value = self.get(key)
+        if found:
+            return value
+
+        value = loader()
+        self.set(key, value)
+        return value
+
+    def invalidate(self, server: Optional[str] = None, site: Optional[str] = None,
+                   user: Optional[str] = None, resource: Optional[str] = None) -> int:
+        """Drop every entry matching the given key parts; returns the number removed"""
+        pattern = (server, site, user, resource)
+        with self._lock:
+            stale = [key for key in self._entries
+                     if all(part is None or part == key[i] for i, part in enumerate(pattern))]
+            for key in stale:
+                self._remove(key)
+        logging.info(f"Invalidated {len(stale)} metadata cache entries")
+        return len(stale)
+
+    def clear(self):
+        """Remove all entries and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remove(self, key: Tuple):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+# Process-wide cache shared by all TableauAPI instances
+metadata_cache = MetadataCache(
+    max_entries=int(os.environ.get("TABLEAU_CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.environ.get("TABLEAU_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+)
@@ -0,0 +1,273 @@
+import io
+import zlib
+import struct
+import logging
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from PIL import Image
+from PyPDF2 import PdfReader
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8"
+
+# PNG colour types that map straight onto a PDF colour space
+PNG_COLOR_SPACES = {0: ("/DeviceGray", 1), 2: ("/DeviceRGB", 3), 3: (None, 1)}
+JPEG_COLOR_SPACES = {"L": "/DeviceGray", "RGB": "/DeviceRGB"}
+
+# Page attributes copied from source PDF pages; the inheritable ones may sit on a parent node
+PAGE_ATTRIBUTES = ("/MediaBox", "/CropBox", "/BleedBox", "/TrimBox", "/ArtBox", "/Rotate", "/Resources",
+                   "/Contents", "/Group", "/UserUnit")
+INHERITABLE_ATTRIBUTES = ("/MediaBox", "/CropBox", "/Rotate", "/Resources")
+
+
+class StreamingPdfWriter:
+    """Writes a PDF of one image per page in a single forward pass.
+
+    Each page is written as soon as it is added, so only one page's image
+    data is in memory at a time and the output can be any writable stream
+    (a file, a socket, a response generator's buffer). PNG and JPEG files are
+    embedded without re-encoding: PNG IDAT data is passed through as
+    FlateDecode with the PNG predictor and JPEG data as DCTDecode. Anything
+    else (alpha, interlacing, 16-bit, in-memory bitmaps) is deflated once.
+    Pages are sized at dpi pixels per inch (72 = one point per pixel).
+    Pages of existing PDFs (vector crops) are copied object by object, with
+    their content streams passed through as they are.
+    """
+
+    def __init__(self, stream: BinaryIO, dpi: float = 72):
+        self.stream = stream
+        self.dpi = dpi
+        self.position = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.passthrough = 0
+        self.reencoded = 0
+        self.copied = 0
+        # 1 is the catalog and 2 the page tree; both are written by close()
+        self._next_id = 3
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def add_image(self, data: Optional[bytes] = None, image: Optional[Image.Image] = None,
+                  dpi: Optional[float] = None):
+        """Add a page showing an encoded PNG/JPEG (data) or a decoded bitmap (image).
+
+        dpi overrides the writer's pixels-per-inch for this page."""
+        xobject = None
+        if data is not None:
+            xobject = self._passthrough_xobject(data)
+            if xobject is None:
+                image = Image.open(io.BytesIO(data))
+        if xobject is None:
+            xobject = self._deflate_xobject(image)
+            self.reencoded += 1
+        else:
+            self.passthrough += 1
+
+        width, height = xobject[0], xobject[1]
+        image_id = self._write_image(*xobject)
+
+        dpi = dpi or self.dpi
+        page_width = round(width * 72 / dpi, 3)
+        page_height = round(height * 72 / dpi, 3)
+        content_id = self._write_object(
+            b"<< >>", f"q {page_width} 0 0 {page_height} 0 0 cm /Im0 Do Q".encode())
+        page_id = self._write_object(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width} {page_height}] "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>".encode())
+        self.page_ids.append(page_id)
+
+    def add_pdf_page(self, source, page_index: int = 0):
+        """Add a page copied from an existing PDF (a path or stream), keeping its vector content.
+
+        The page's content streams and resources (fonts, images, forms) are
+        written with new object numbers; annotations and links are dropped."""
+        page = PdfReader(source).pages[page_index]
+        new_ids: Dict[Tuple[int, int], int] = {}
+        pending: List[IndirectObject] = []
+
+        def reference(obj: IndirectObject) -> IndirectObject:
+            key = (obj.idnum, obj.generation)
+            if key not in new_ids:
+                new_ids[key] = self._next_id
+                self._next_id += 1
+                pending.append(obj)
+            return IndirectObject(new_ids[key], 0, None)
+
+        def renumber(obj):
+            if isinstance(obj, IndirectObject):
+                return reference(obj)
+            if isinstance(obj, DictionaryObject):
+                copy = DictionaryObject()
+                for key, value in dict.items(obj):
+                    if key != "/Length" or not isinstance(obj, StreamObject):
+                        copy[key] = renumber(value)
+                return copy
+            if isinstance(obj, ArrayObject):
+                return ArrayObject(renumber(value) for value in obj)
+            return obj
+
+        attributes = DictionaryObject({NameObject("/Type"): NameObject("/Page"),
+                                       NameObject("/Parent"): IndirectObject(2, 0, None)})
+        for name in PAGE_ATTRIBUTES:
+            value = _page_attribute(page, name)
+            if value is not None:
+                attributes[NameObject(name)] = renumber(value)
+        attributes.setdefault(NameObject("/Resources"), DictionaryObject())
+        page_id = self._write_object(_serialize(attributes))
+
+        while pending:
+            source_ref = pending.pop()
+            obj = source_ref.get_object()
+            obj_id = new_ids[(source_ref.idnum, source_ref.generation)]
+            if isinstance(obj, StreamObject):
+                self._write_object(_serialize(renumber(obj)), obj._data, obj_id=obj_id)
+            else:
+                self._write_object(_serialize(renumber(obj)), obj_id=obj_id)
+
+        self.page_ids.append(page_id)
+        self.copied += 1
+
+    def close(self):
+        """Write the page tree, catalog, cross-reference table and trailer"""
+        if not self.page_ids:
+            raise Exception("PDF has no pages")
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode(), obj_id=2)
+        self._write_object(b"<< /Type /Catalog /Pages 2 0 R >>", obj_id=1)
+
+        xref_offset = self.position
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        lines += [f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, size)]
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._write("".join(lines).encode())
+
+        logging.info(f"Wrote {len(self.page_ids)}-page PDF ({self.passthrough} images passed through, "
+                     f"{self.reencoded} deflated, {self.copied} PDF pages copied)")
+
+    def _write(self, data: bytes):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def _write_object(self, dictionary: bytes, stream: Optional[bytes] = None, obj_id: Optional[int] = None) -> int:
+        if obj_id is None:
+            obj_id = self._next_id
+            self._next_id += 1
+        self.offsets[obj_id] = self.position
+
+        if stream is None:
+            self._write(b"%d 0 obj\n%s\nendobj\n" % (obj_id, dictionary))
+        else:
+            # Stream dictionaries are passed in without /Length, which is added here
+            dictionary = dictionary[:-2].rstrip() + b" /Length %d >>" % len(stream)
+            self._write(b"%d 0 obj\n%s\nstream\n" % (obj_id, dictionary))
+            self._write(stream)
+            self._write(b"\nendstream\nendobj\n")
+        return obj_id
+
+    def _write_image(self, width: int, height: int, dictionary: str, data: bytes,
+                     smask: Optional[bytes] = None) -> int:
+        if smask is not None:
+            smask_id = self._write_object(
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode >>".encode(), smask)
+            dictionary = dictionary[:-2].rstrip() + f" /SMask {smask_id} 0 R >>"
+        return self._write_object(dictionary.encode(), data)
+
+    def _passthrough_xobject(self, data: bytes) -> Optional[Tuple]:
+        if data.startswith(PNG_SIGNATURE):
+            return self._png_xobject(data)
+        if data.startswith(JPEG_SIGNATURE):
+            return self._jpeg_xobject(data)
+        return None
+
+    @staticmethod
+    def _png_xobject(data: bytes) -> Optional[Tuple]:
+        """Reuse a PNG's compressed IDAT stream; None if it needs decoding"""
+        position = len(PNG_SIGNATURE)
+        header = None
+        palette = None
+        idat = []
+        while position + 8 <= len(data):
+            length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+            body = data[position + 8:position + 8 + length]
+            if chunk_type == b"IHDR":
+                header = struct.unpack(">IIBBBBB", body)
+            elif chunk_type == b"PLTE":
+                palette = body
+            elif chunk_type == b"tRNS":
+                return None
+            elif chunk_type == b"IDAT":
+                idat.append(body)
+            elif chunk_type == b"IEND":
+                break
+            position += 12 + length
+
+        if header is None:
+            return None
+        width, height, bit_depth, color_type, _, _, interlace = header
+        if interlace or color_type not in PNG_COLOR_SPACES:
+            return None
+        # Sub-byte depths (e.g. quantized palettes) are valid PDF too; 16-bit is not in PDF 1.4
+        if bit_depth not in ((1, 2, 4, 8) if color_type != 2 else (8,)):
+            return None
+
+        color_space, colors = PNG_COLOR_SPACES[color_type]
+        if color_type == 3:
+            if palette is None:
+                return None
+            color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+
+        dictionary = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                      f"/ColorSpace {color_space} /BitsPerComponent {bit_depth} /Filter /FlateDecode "
+                      f"/DecodeParms << /Predictor 15 /Colors {colors} /BitsPerComponent {bit_depth} "
+                      f"/Columns {width} >> >>")
+        return width, height, dictionary, b"".join(idat)
+
+    @staticmethod
+    def _jpeg_xobject(data: bytes) -> Optional[Tuple]:
+        """Embed JPEG data as-is; None for colour modes PDF would misread (e.g. Adobe CMYK)"""
+        with Image.open(io.BytesIO(data)) as image:
+            if image.mode not in JPEG_COLOR_SPACES:
+                return None
+            width, height, color_space = image.width, image.height, JPEG_COLOR_SPACES[image.mode]
+
+        dictionary = (f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                      f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /DCTDecode >>")
+        return width, height, dictionary, data
+
+    @staticmethod
+    def _deflate_xobject(image: Image.Image) -> Tuple:
+        """Losslessly deflate a decoded bitmap, carrying alpha as a soft mask"""
+        smask = None
+        if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+            image = image.convert("RGBA")
+            smask = zlib.compress(image.getchannel("A").tobytes())
+            image = image.convert("RGB")
+        elif image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+
+        color_space = "/DeviceGray" if image.mode == "L" else "/DeviceRGB"
+        dictionary = (f"<< /Type /XObject /Subtype /Image /Width {image.width} /Height {image.height} "
+                      f"/ColorSpace {color_space} /BitsPerComponent 8 /Filter /FlateDecode >>")
+        return image.width, image.height, dictionary, zlib.compress(image.tobytes()), smask
+
+
+def _page_attribute(page: DictionaryObject, name: str):
+    """A page attribute (unresolved), looked up on parent nodes for inheritable ones"""
+    node = page
+    while node is not None:
+        if name in node:
+            return dict.__getitem__(node, name)
+        if name not in INHERITABLE_ATTRIBUTES or "/Parent" not in node:
+            return None
+        node = node["/Parent"]
+    return None
+
+
+def _serialize(obj) -> bytes:
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    return buffer.getvalue()
@@ -0,0 +1,128 @@
+import os
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from PIL import Image
+from pdf2image import convert_from_path
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # optional in-process backend
+    pdfium = None
+
+
+class PopplerRasterizer:
+    """Renders through poppler's pdftoppm (one subprocess per call).
+
+    pdftoppm writes the PNGs itself, so the pixels never pass through this
+    process unless a compress level asks for a re-encode. Multi-page ranges
+    are split over thread_count pdftoppm processes.
+    """
+
+    name = "poppler"
+
+    def render(self, pdf_path: str, output_dir: str, base_name: str, first_page: int = 1,
+               last_page: Optional[int] = None, dpi: int = 200, thread_count: int = 1,
+               compress_level: Optional[int] = None) -> List[str]:
+        # Single pages are written as <base>.png; ranges get pdftoppm page suffixes
+        png_paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            fmt='png',
+            output_folder=output_dir,
+            output_file=base_name,
+            single_file=(first_page == last_page),
+            paths_only=True,
+            thread_count=thread_count
+        )
+
+        if compress_level is not None:
+            for png_path in png_paths:
+                with Image.open(png_path) as image:
+                    image.load()
+                image.save(png_path, "PNG", compress_level=compress_level)
+
+        return png_paths
+
+    def render_images(self, pdf_path: str, first_page: int = 1, last_page: Optional[int] = None,
+                      dpi: int = 200, thread_count: int = 1) -> List[Image.Image]:
+        """Render pages to in-memory bitmaps (PPM over a pipe, no PNG encode)"""
+        return convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            thread_count=thread_count
+        )
+
+
+class PdfiumRasterizer:
+    """Renders in-process with pypdfium2, avoiding the fork/exec and PPM round-trip.
+
+    PDFium is not thread-safe, so renders are serialized with a process-wide
+    lock; parallelism comes from running several workers rather than threads.
+    """
+
+    name = "pdfium"
+    _lock = threading.Lock()
+
+    def __init__(self):
+        if pdfium is None:
+            raise Exception("pypdfium2 is not installed; use RASTER_BACKEND=poppler")
+
+    def render(self, pdf_path: str, output_dir: str, base_name: str, first_page: int = 1,
+               last_page: Optional[int] = None, dpi: int = 200, thread_count: int = 1,
+               compress_level: Optional[int] = None) -> List[str]:
+        images = self.render_images(pdf_path, first_page, last_page, dpi)
+
+        # PNG encoding needs no PDFium state, so it runs outside the lock
+        png_paths = []
+        for page_number, image in enumerate(images, start=first_page):
+            suffix = "" if len(images) == 1 else f"-{page_number}"
+            png_path = os.path.join(output_dir, f"{base_name}{suffix}.png")
+            image.save(png_path, "PNG", compress_level=6 if compress_level is None else compress_level)
+            png_paths.append(png_path)
+
+        return png_paths
+
+    def render_images(self, pdf_path: str, first_page: int = 1, last_page: Optional[int] = None,
+                      dpi: int = 200, thread_count: int = 1) -> List[Image.Image]:
+        """Render pages to in-memory bitmaps"""
+        images = []
+        with self._lock:
+            document = pdfium.PdfDocument(pdf_path)
+            try:
+                last_page = min(last_page or len(document), len(document))
+                for page_number in range(first_page, last_page + 1):
+                    page = document[page_number - 1]
+                    try:
+                        images.append(page.render(scale=dpi / 72).to_pil())
+                    finally:
+                        page.close()
+            finally:
+                document.close()
+
+        return images
+
+
+RASTERIZERS = {
+    PopplerRasterizer.name: PopplerRasterizer,
+    PdfiumRasterizer.name: PdfiumRasterizer,
+}
+
+_instances: Dict[str, object] = {}
+
+
+def get_rasterizer(name: Optional[str] = None):
+    """Return the shared rasterizer for a backend name (RASTER_BACKEND by default)"""
+    name = (name or os.environ.get("RASTER_BACKEND", "poppler")).lower()
+    if name not in RASTERIZERS:
+        raise Exception(f"Unknown rasterizer backend '{name}'; expected one of {', '.join(RASTERIZERS)}")
+
+    if name not in _instances:
+        _instances[name] = RASTERIZERS[name]()
+        logging.info(f"Using {name} rasterizer backend")
+    return _instances[name]
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import secrets
+import sqlite3
+import logging
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session whose contents live in a SessionBackend; the cookie only names it"""
+
+    def __init__(self, initial=None, sid: Optional[str] = None, blob: Optional[str] = None,
+                 expires: float = 0.0):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        # Serialized form as loaded, so nested edits without session.modified still get saved
+        self.blob = blob
+        self.expires = expires
+        # Id given up by regenerate(), deleted from the backend on save
+        self.replaced_sid: Optional[str] = None
+        self.modified = False
+        self.accessed = False
+
+    def regenerate(self):
+        """Move the data to a fresh id (on login), so an id planted beforehand never becomes authenticated"""
+        if self.blob is not None and self.replaced_sid is None:
+            self.replaced_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.blob = None
+        self.modified = True
+
+
+class MemorySessionBackend:
+    """Sessions held in this process; fine for a single worker (the default deployment)"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            entry = self._sessions.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._sessions[sid]
+                return None
+            return entry
+
+    def save(self, sid: str, blob: str, expires: float):
+        with self._lock:
+            self._sessions[sid] = (blob, expires)
+
+    def touch(self, sid: str, expires: float):
+        with self._lock:
+            if sid in self._sessions:
+                self._sessions[sid] = (self._sessions[sid][0], expires)
+
+    def delete(self, sid: str):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def purge(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._sessions.items() if expires < now]
+            for sid in expired:
+                del self._sessions[sid]
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions)}
+
+
+class SQLiteSessionBackend:
+    """Sessions in a local SQLite file, shared by every worker process on the host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS sessions "
+                       "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed while another worker writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def load(self, sid: str) -> Optional[Tuple[str, float]]:
+        row = self._connect().execute(
+            "SELECT data, expires FROM sessions WHERE sid = ? AND expires >= ?", (sid, time.time())).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, sid: str, blob: str, expires: float):
+        self._connect().execute(
+            "INSERT INTO sessions (sid, data, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT(sid) DO UPDATE SET data = excluded.data, expires = excluded.expires",
+            (sid, blob, expires))
+
+    def touch(self, sid: str, expires: float):
+        self._connect().execute("UPDATE sessions SET expires = ? WHERE sid = ?", (expires, sid))
+
+    def delete(self, sid: str):
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def purge(self) -> int:
+        return self._connect().execute("DELETE FROM sessions WHERE expires < ?", (time.time(),)).rowcount
+
+    def stats(self) -> Dict[str, int]:
+        return {"sessions": self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]}
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in a backend store and only a signed session id in the cookie.
+
+    The state stays out of every request and response, so its size (one slot
+    per dashboard) no longer counts against the ~4 KB cookie limit or the
+    per-request signing cost. Data is written back only when it changed, and
+    the expiry is refreshed at most once per touch_interval seconds.
+    """
+
+    @staticmethod
+    def _dumps(data) -> str:
+        # Plain (C-accelerated) JSON: it runs on every request to detect changes, and
+        # session values are JSON types anyway (tuples such as flashes come back as lists)
+        return json.dumps(data, separators=(",", ":"), sort_keys=True)
+
+    def __init__(self, backend, touch_interval: float = 300):
+        self.backend = backend
+        self.touch_interval = touch_interval
+        self._last_purge = 0.0
+
+    def _signer(self, app) -> Signer:
+        return Signer(app.secret_key, salt="server-side-session")
+
+    def open_session(self, app, request) -> ServerSideSession:
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode()
+            except BadSignature:
+                sid = None
+            stored = self.backend.load(sid) if sid else None
+            if stored is not None:
+                blob, expires = stored
+                return ServerSideSession(json.loads(blob), sid=sid, blob=blob, expires=expires)
+        return ServerSideSession(sid=secrets.token_urlsafe(32))
+
+    def save_session(self, app, session: ServerSideSession, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid is not None:
+            self.backend.delete(session.replaced_sid)
+            session.replaced_sid = None
+
+        if not session:
+            if session.blob is not None:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        now = time.time()
+        expires = now + app.permanent_session_lifetime.total_seconds()
+        blob = self._dumps(dict(session))
+        if blob != session.blob:
+            self.backend.save(session.sid, blob, expires)
+        elif expires - session.expires >= self.touch_interval:
+            self.backend.touch(session.sid, expires)
+        else:
+            return
+
+        # Expired sessions are swept occasionally rather than on every write
+        if now - self._last_purge > 3600:
+            self._last_purge = now
+            purged = self.backend.purge()
+            if purged:
+                logging.info(f"Purged {purged} expired sessions")
+
+        if session.blob is None or session.permanent:
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid).decode(),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def create_session_interface(backend: str, path: str) -> Optional[SessionInterface]:
+    """Session interface for a SESSION_BACKEND value; None keeps Flask's cookie session"""
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        return ServerSideSessionInterface(MemorySessionBackend())
+    if backend == "sqlite":
+        return ServerSideSessionInterface(SQLiteSessionBackend(path))
+    raise Exception(f"Unknown session backend '{backend}' (expected sqlite, memory or cookie)")
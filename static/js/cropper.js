@@ -1,6 +1,6 @@
 let cropper = null;
 
-function initializeCropper(imageUrl, workbookIndex) {
+function initializeCropper(imageUrl, workbookIndex, fullWidth, fullHeight, proposal) {
     const canvas = document.getElementById('cropCanvas');
     const ctx = canvas.getContext('2d');
     const container = document.getElementById('cropContainer');
@@ -8,6 +8,7 @@ function initializeCropper(imageUrl, workbookIndex) {
     const saveBtn = document.getElementById('saveCrop');
     const cropInfo = document.getElementById('cropInfo');
     const cropDimensions = document.getElementById('cropDimensions');
+    const saveTemplate = document.getElementById('saveTemplate');
     
     let img = new Image();
     let isDrawing = false;
@@ -29,6 +30,22 @@ function initializeCropper(imageUrl, workbookIndex) {
             canvas.style.width = maxWidth + 'px';
             canvas.style.height = (img.height * scale) + 'px';
         }
+        
+        // Preselect the saved or auto-detected crop, mapped onto the (possibly downscaled) preview
+        if (proposal) {
+            const scaleX = fullWidth ? img.width / fullWidth : 1;
+            const scaleY = fullHeight ? img.height / fullHeight : 1;
+            selection = {
+                x: proposal.x * scaleX,
+                y: proposal.y * scaleY,
+                width: proposal.width * scaleX,
+                height: proposal.height * scaleY
+            };
+            resetBtn.disabled = false;
+            saveBtn.disabled = false;
+            drawSelection();
+            updateCropInfo();
+        }
     };
     
     img.onerror = function() {
@@ -171,7 +188,11 @@ function initializeCropper(imageUrl, workbookIndex) {
             const width = selection ? selection.width : Math.abs(endX - startX);
             const height = selection ? selection.height : Math.abs(endY - startY);
             
-            cropDimensions.textContent = `${Math.round(width)} × ${Math.round(height)} pixels at (${Math.round(x)}, ${Math.round(y)})`;
+            // The canvas may show a downscaled preview; report full-resolution pixels
+            const scaleX = fullWidth ? fullWidth / img.width : 1;
+            const scaleY = fullHeight ? fullHeight / img.height : 1;
+            
+            cropDimensions.textContent = `${Math.round(width * scaleX)} × ${Math.round(height * scaleY)} pixels at (${Math.round(x * scaleX)}, ${Math.round(y * scaleY)})`;
             cropInfo.style.display = 'block';
         } else {
             cropInfo.style.display = 'none';
@@ -204,7 +225,9 @@ function initializeCropper(imageUrl, workbookIndex) {
             },
             body: JSON.stringify({
                 workbook_index: workbookIndex,
-                crop_data: selection
+                crop_data: selection,
+                frame_size: [img.width, img.height],
+                save_template: saveTemplate ? saveTemplate.checked : false
             })
         })
         .then(response => response.json())
@@ -225,7 +248,8 @@ function initializeCropper(imageUrl, workbookIndex) {
                 window.opener.postMessage({
                     type: 'cropComplete',
                     workbookIndex: workbookIndex,
-                    thumbnailFilename: data.thumbnail_filename
+                    thumbnailFilename: data.thumbnail_filename,
+                    thumbnailUrl: data.thumbnail_url
                 }, '*');
             }
             
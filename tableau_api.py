@@ -1,8 +1,304 @@
+import os
+import time
+import random
+import threading
 import requests
 import logging
-from typing import Dict, List, Tuple, Optional
+import http.cookiejar
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Tuple, Optional, Union
+
+import instrumentation
+from metadata_cache import MetadataCache, metadata_cache
+
+# Connection pool settings shared by every TableauAPI instance in the process
+POOL_CONFIG = {
+    "pool_connections": int(os.environ.get("TABLEAU_POOL_CONNECTIONS", "4")),
+    "pool_maxsize": int(os.environ.get("TABLEAU_POOL_MAXSIZE", "16")),
+    "keep_alive": os.environ.get("TABLEAU_KEEP_ALIVE", "1") != "0",
+    "connect_timeout": float(os.environ.get("TABLEAU_CONNECT_TIMEOUT", "10")),
+    "read_timeout": float(os.environ.get("TABLEAU_READ_TIMEOUT", "120")),
+}
+
+# Page size for paginated REST listings (Tableau allows up to 1000)
+PAGE_SIZE = int(os.environ.get("TABLEAU_PAGE_SIZE", "100"))
+
+# Streaming download settings for view exports
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("TABLEAU_DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+# Minimum seconds between download progress events
+DOWNLOAD_PROGRESS_INTERVAL = 0.25
+MAX_EXPORT_BYTES = int(os.environ.get("TABLEAU_MAX_EXPORT_BYTES", str(200 * 1024 * 1024)))
+
+# Per-site request scheduling: concurrency caps, token bucket and retry policy
+SCHEDULER_CONFIG = {
+    "max_concurrency": int(os.environ.get("TABLEAU_MAX_CONCURRENCY", "8")),
+    "render_concurrency": int(os.environ.get("TABLEAU_SITE_CONCURRENCY", "4")),
+    "rate": float(os.environ.get("TABLEAU_RATE_LIMIT", "10")),
+    "burst": int(os.environ.get("TABLEAU_RATE_BURST", "20")),
+    "max_retries": int(os.environ.get("TABLEAU_MAX_RETRIES", "4")),
+    "backoff_base": float(os.environ.get("TABLEAU_BACKOFF_BASE", "0.5")),
+    "backoff_max": float(os.environ.get("TABLEAU_BACKOFF_MAX", "30")),
+}
+
+# Sign-in token lifetime, and how long before expiry users are sent back to sign in
+TOKEN_TTL = float(os.environ.get("TABLEAU_TOKEN_TTL", str(120 * 60)))
+TOKEN_REFRESH_MARGIN = float(os.environ.get("TABLEAU_TOKEN_REFRESH_MARGIN", "300"))
+
+# Statuses that mean "try again later"; 429/503 are safe to retry for any method
+THROTTLE_STATUSES = {429, 503}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+_schedulers: Dict[Tuple[str, str], "RequestScheduler"] = {}
+
+
+class TableauAPIError(Exception):
+    """A Tableau REST call failed; carries the HTTP status and Retry-After when known"""
+    
+    def __init__(self, message: str, cause: Optional[BaseException] = None):
+        super().__init__(message)
+        response = getattr(cause, "response", None)
+        self.status_code = response.status_code if response is not None else getattr(cause, "status_code", None)
+        self.retry_after = parse_retry_after(response) if response is not None else getattr(cause, "retry_after", None)
+
+
+def parse_retry_after(response: requests.Response) -> Optional[float]:
+    """Return the Retry-After header in seconds (delta or HTTP date), if present"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+    """Admission control for the REST calls made to one Tableau site.
+
+    Requests wait for one of max_concurrency in-flight slots and a token from a
+    bucket refilled at rate per second (up to burst). Throttled (429/503) and
+    transient 5xx responses are retried with jittered exponential backoff;
+    a Retry-After header pauses the whole site for that long. View renders
+    additionally hold one of render_concurrency slots for the full download.
+    """
+    
+    def __init__(self, max_concurrency: int, render_concurrency: int, rate: float, burst: int,
+                 max_retries: int, backoff_base: float, backoff_max: float):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._inflight = threading.BoundedSemaphore(max_concurrency)
+        self._renders = threading.BoundedSemaphore(render_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self.metrics = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "failures": 0,
+            "queued_seconds": 0.0,
+            "max_queued_seconds": 0.0,
+            "render_queued_seconds": 0.0,
+            "max_render_queued_seconds": 0.0,
+            "wire_seconds": 0.0,
+        }
+    
+    def _take_token(self):
+        """Block until the site is not paused and a rate-limit token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                    self._refilled_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+    
+    @contextmanager
+    def slot(self):
+        """Hold an in-flight slot and a token for the duration of one request"""
+        queued_from = time.monotonic()
+        self._inflight.acquire()
+        try:
+            self._take_token()
+            queued = time.monotonic() - queued_from
+            with self._lock:
+                self.metrics["queued_seconds"] += queued
+                self.metrics["max_queued_seconds"] = max(self.metrics["max_queued_seconds"], queued)
+            yield
+        finally:
+            self._inflight.release()
+    
+    @contextmanager
+    def render_slot(self):
+        """Hold one of the site's render slots (PDF/image exports) until the download completes.
+        
+        Waiting here is counted as render_queued_seconds, apart from the
+        in-flight slot wait each request then adds to queued_seconds.
+        """
+        queued_from = time.monotonic()
+        with self._renders:
+            queued = time.monotonic() - queued_from
+            with self._lock:
+                self.metrics["render_queued_seconds"] += queued
+                self.metrics["max_render_queued_seconds"] = max(self.metrics["max_render_queued_seconds"], queued)
+            yield
+    
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = parse_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            # Hold back every request to this site, not just the one that was throttled
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def send(self, method: str, send: Callable[[], requests.Response]) -> requests.Response:
+        """Send a request under admission control, retrying throttled and transient failures"""
+        attempt = 0
+        while True:
+            response = None
+            error = None
+            with self.slot():
+                started = time.monotonic()
+                try:
+                    response = send()
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    error = e
+                finally:
+                    with self._lock:
+                        self.metrics["requests"] += 1
+                        self.metrics["wire_seconds"] += time.monotonic() - started
+            
+            status = response.status_code if response is not None else None
+            if status in THROTTLE_STATUSES:
+                with self._lock:
+                    self.metrics["throttled"] += 1
+            
+            # Only idempotent GETs are retried after errors the server may have acted on
+            retryable = status in THROTTLE_STATUSES or (
+                method.upper() == "GET" and (error is not None or status in RETRY_STATUSES))
+            
+            if not retryable or attempt >= self.max_retries:
+                if retryable:
+                    with self._lock:
+                        self.metrics["failures"] += 1
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = self._retry_delay(attempt, response)
+            reason = f"HTTP {status}" if response is not None else type(error).__name__
+            logging.warning(f"Tableau request throttled or failed ({reason}); retry {attempt + 1} in {delay:.2f}s")
+            if response is not None:
+                response.close()
+            with self._lock:
+                self.metrics["retries"] += 1
+            time.sleep(delay)
+            attempt += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return request counts and time spent queued versus on the wire"""
+        with self._lock:
+            stats = dict(self.metrics)
+        stats["queued_seconds"] = round(stats["queued_seconds"], 3)
+        stats["max_queued_seconds"] = round(stats["max_queued_seconds"], 3)
+        stats["render_queued_seconds"] = round(stats["render_queued_seconds"], 3)
+        stats["max_render_queued_seconds"] = round(stats["max_render_queued_seconds"], 3)
+        stats["wire_seconds"] = round(stats["wire_seconds"], 3)
+        return stats
+
+
+def token_expiring(issued_at: Optional[float]) -> bool:
+    """True once a token issued at issued_at is within TOKEN_REFRESH_MARGIN of TOKEN_TTL"""
+    return issued_at is not None and time.time() - issued_at >= TOKEN_TTL - TOKEN_REFRESH_MARGIN
+
+
+def get_session(server_url: str) -> requests.Session:
+    """Return the process-wide pooled session for a Tableau server"""
+    server_url = server_url.rstrip('/')
+    with _sessions_lock:
+        session = _sessions.get(server_url)
+        if session is None:
+            session = requests.Session()
+            # The session is shared by every user: never keep a cookie one user's
+            # response set (auth travels in X-Tableau-Auth only)
+            session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            adapter = HTTPAdapter(
+                pool_connections=POOL_CONFIG["pool_connections"],
+                pool_maxsize=POOL_CONFIG["pool_maxsize"]
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if not POOL_CONFIG["keep_alive"]:
+                session.headers["Connection"] = "close"
+            _sessions[server_url] = session
+            logging.info(f"Created pooled HTTP session for {server_url}")
+        return session
+
+
+def get_scheduler(server_url: str, site_id: str) -> RequestScheduler:
+    """Return the process-wide request scheduler for a Tableau site"""
+    key = (server_url.rstrip('/'), site_id)
+    with _sessions_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = RequestScheduler(**SCHEDULER_CONFIG)
+            _schedulers[key] = scheduler
+        return scheduler
+
+
+def scheduler_stats() -> Dict[str, Dict[str, Any]]:
+    """Return scheduler metrics for every site seen by this process"""
+    with _sessions_lock:
+        schedulers = dict(_schedulers)
+    return {f"{server}#{site}": scheduler.stats() for (server, site), scheduler in schedulers.items()}
+
+
+def filter_params(filters: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """Translate {field: value} view filters into vf_<field>=value query parameters"""
+    return {f"vf_{field}": str(value) for field, value in (filters or {}).items()}
+
+
+def configure_pool(**settings):
+    """Update pool settings and drop existing sessions so new ones pick them up"""
+    unknown = set(settings) - set(POOL_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown pool settings: {', '.join(sorted(unknown))}")
+    POOL_CONFIG.update(settings)
+    close_sessions()
+
+
+def close_sessions():
+    """Close all pooled sessions and their connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
 
 class TableauAPI:
+    # Metadata cache shared by all instances; keyed per server, site and user
+    cache: MetadataCache = metadata_cache
+    
     def __init__(self, server_url: str, site_id: str):
         self.server_url = server_url.rstrip('/')
         self.site_id = site_id
@@ -10,9 +306,39 @@ class TableauAPI:
         self.site_id_response = None
         self.user_id = None
         self.api_version = "3.20"
+        self.session = get_session(self.server_url)
+        self.scheduler = get_scheduler(self.server_url, self.site_id)
+        self.username = None
+        self.token_issued_at = None
+        self.token_rejected = False
+    
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send a request through the pooled session and the site's scheduler.
+
+        A 401 on a signed-in request marks the token as rejected; there is no
+        password to sign in again with, so callers send the user back to login."""
+        kwargs.setdefault("timeout", (POOL_CONFIG["connect_timeout"], POOL_CONFIG["read_timeout"]))
+        response = self.scheduler.send(method, lambda: self.session.request(method, url, **kwargs))
+        
+        if response.status_code == 401 and "X-Tableau-Auth" in kwargs.get("headers", {}):
+            logging.warning(f"Tableau rejected the token for {self.username}; a new sign-in is required")
+            self.token_rejected = True
+        
+        return response
+    
+    def resume(self, username: str, token: str, site_id_response: str, user_id: str,
+               issued_at: Optional[float] = None):
+        """Attach an existing sign-in (one per Flask session) to this client"""
+        self.username = username
+        self.token = token
+        self.site_id_response = site_id_response
+        self.user_id = user_id
+        self.token_issued_at = issued_at
     
     def authenticate(self, username: str, password: str) -> Tuple[str, str, str]:
-        """Authenticate with Tableau Server and return token, site_id, user_id"""
+        """Authenticate with Tableau Server and return token, site_id, user_id.
+
+        The password is used for this sign-in only and never kept."""
         url = f"{self.server_url}/api/{self.api_version}/auth/signin"
         
         payload = {
@@ -30,13 +356,16 @@ class TableauAPI:
         
         try:
             logging.info(f"Attempting authentication for user: {username} on site: {self.site_id}")
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
+            with instrumentation.stage("auth", user=username):
+                response = self._request("POST", url, json=payload, headers=headers)
+                response.raise_for_status()
             
             data = response.json()
             self.token = data['credentials']['token']
             self.site_id_response = data['credentials']['site']['id']
             self.user_id = data['credentials']['user']['id']
+            self.username = username
+            self.token_issued_at = time.time()
             
             logging.info(f"Successfully authenticated user: {username}")
             logging.info(f"Received site_id: {self.site_id_response}")
@@ -54,9 +383,18 @@ class TableauAPI:
                     error_msg = error_data.get('error', {}).get('detail', str(e))
                 except:
                     error_msg = f"HTTP {e.response.status_code}: {e.response.text}"
-                raise Exception(f"Tableau authentication failed: {error_msg}")
+                raise TableauAPIError(f"Tableau authentication failed: {error_msg}", e)
             else:
-                raise Exception(f"Network error during authentication: {str(e)}")
+                raise TableauAPIError(f"Network error during authentication: {str(e)}", e)
+    
+    def _cached(self, resource: str, identifier: Optional[str], loader: Callable[[], Any]) -> Any:
+        """Serve a metadata listing from the shared cache, loading it on a miss"""
+        key = (self.server_url, self.site_id_response, self.user_id, resource, identifier)
+        return self.cache.get_or_load(key, loader)
+    
+    def invalidate_metadata(self, resource: Optional[str] = None) -> int:
+        """Drop cached metadata for this user, optionally only one resource type"""
+        return self.cache.invalidate(self.server_url, self.site_id_response, self.user_id, resource)
     
     def _get_headers(self) -> Dict[str, str]:
         """Get headers with authentication token"""
@@ -68,31 +406,54 @@ class TableauAPI:
             "Accept": "application/json"
         }
     
-    def get_projects(self) -> List[Dict]:
-        """Get all projects accessible to the authenticated user"""
-        if not self.site_id_response:
-            raise Exception("No site ID available. Please authenticate first.")
-            
-        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/projects"
+    def _iter_pages(self, url: str, collection: str, item: str, params: Optional[Dict] = None,
+                    page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """Yield the items of a paginated REST collection one page at a time"""
+        page_size = page_size or PAGE_SIZE
+        page_number = 1
+        fetched = 0
         
-        try:
-            logging.info(f"Requesting projects from: {url}")
-            response = requests.get(url, headers=self._get_headers())
+        while True:
+            query = dict(params or {})
+            query.update({"pageSize": page_size, "pageNumber": page_number})
             
-            logging.info(f"Projects response status: {response.status_code}")
+            response = self._request("GET", url, headers=self._get_headers(), params=query)
             if response.status_code != 200:
-                logging.error(f"Projects response text: {response.text}")
-            
+                logging.error(f"Page {page_number} of {url} failed: {response.text}")
             response.raise_for_status()
             
             data = response.json()
-            logging.info(f"Projects response data: {data}")
+            items = data.get(collection, {}).get(item, [])
             
-            projects = data.get("projects", {}).get("project", [])
+            # Ensure items is always a list
+            if isinstance(items, dict):
+                items = [items]
             
-            # Ensure projects is always a list
-            if isinstance(projects, dict):
-                projects = [projects]
+            # Endpoints without a pagination block return everything in one page
+            total = int(data.get("pagination", {}).get("totalAvailable", fetched + len(items)))
+            fetched += len(items)
+            logging.debug(f"Fetched page {page_number} of {url}: {fetched}/{total} {collection}")
+            
+            if items:
+                yield items
+            if not items or fetched >= total:
+                break
+            page_number += 1
+    
+    def iter_projects(self, page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """Yield projects accessible to the authenticated user page by page"""
+        if not self.site_id_response:
+            raise Exception("No site ID available. Please authenticate first.")
+        
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/projects"
+        logging.info(f"Requesting projects from: {url}")
+        return self._iter_pages(url, "projects", "project", page_size=page_size)
+    
+    def get_projects(self) -> List[Dict]:
+        """Get all projects accessible to the authenticated user"""
+        try:
+            projects = self._cached("projects", None,
+                                    lambda: [project for page in self.iter_projects() for project in page])
             
             logging.info(f"Retrieved {len(projects)} projects")
             for project in projects[:3]:  # Log first 3 projects for debugging
@@ -105,77 +466,75 @@ class TableauAPI:
             if hasattr(e, 'response') and e.response is not None:
                 logging.error(f"Response status: {e.response.status_code}")
                 logging.error(f"Response text: {e.response.text}")
-            raise Exception(f"Failed to retrieve projects: {str(e)}")
+            raise TableauAPIError(f"Failed to retrieve projects: {str(e)}", e)
+    
+    def find_project(self, project_name: str) -> Optional[Dict]:
+        """Return the accessible project whose name matches (case-insensitively), if any"""
+        for project in self.get_projects():
+            if project['name'].lower() == project_name.lower():
+                return project
+        return None
+    
+    def iter_workbooks_in_project(self, project_name: str, page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """Yield the workbooks of a project page by page.
+        
+        The listing is narrowed server-side by project name where the name can
+        be expressed in a filter, but workbooks are always matched on project
+        id, since nested projects may share a name.
+        """
+        project = self.find_project(project_name)
+        if not project:
+            logging.warning(f"Project '{project_name}' not found")
+            return
+        
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/workbooks"
+        params = None
+        # ',' and ':' delimit filter expressions and cannot be escaped in a value
+        if not any(char in project['name'] for char in ",:"):
+            params = {"filter": f"projectName:eq:{project['name']}"}
+        
+        for page in self._iter_pages(url, "workbooks", "workbook", params=params, page_size=page_size):
+            workbooks = [wb for wb in page if wb.get('project', {}).get('id') == project['id']]
+            if workbooks:
+                yield workbooks
     
     def list_workbooks_in_project(self, project_name: str) -> List[Dict]:
         """Get all workbooks in a specific project"""
         try:
-            # First get the project ID
-            projects = self.get_projects()
-            project_id = None
-            
-            for project in projects:
-                if project['name'].lower() == project_name.lower():
-                    project_id = project['id']
-                    break
-            
-            if not project_id:
-                logging.warning(f"Project '{project_name}' not found")
-                return []
-            
-            # Get all workbooks
-            url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/workbooks"
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            data = response.json()
-            all_workbooks = data.get("workbooks", {}).get("workbook", [])
-            
-            # Ensure workbooks is always a list
-            if isinstance(all_workbooks, dict):
-                all_workbooks = [all_workbooks]
-            
-            # Filter workbooks by project
-            project_workbooks = []
-            for wb in all_workbooks:
-                if wb.get('project', {}).get('id') == project_id:
-                    project_workbooks.append(wb)
+            project_workbooks = self._cached("workbooks", project_name,
+                                             lambda: [wb for page in self.iter_workbooks_in_project(project_name) for wb in page])
             
             logging.info(f"Retrieved {len(project_workbooks)} workbooks for project '{project_name}'")
             return project_workbooks
             
         except Exception as e:
             logging.error(f"Failed to get workbooks for project '{project_name}': {str(e)}")
-            raise Exception(f"Failed to retrieve workbooks: {str(e)}")
+            raise TableauAPIError(f"Failed to retrieve workbooks: {str(e)}", e)
+    
+    def iter_views_in_workbook(self, workbook_id: str, page_size: Optional[int] = None) -> Iterator[List[Dict]]:
+        """Yield the views (dashboards) of a workbook page by page"""
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/workbooks/{workbook_id}/views"
+        return self._iter_pages(url, "views", "view", page_size=page_size)
     
     def get_views_in_workbook(self, workbook_id: str) -> List[Dict]:
         """Get all views (dashboards) in a specific workbook"""
-        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/workbooks/{workbook_id}/views"
-        
         try:
-            response = requests.get(url, headers=self._get_headers())
-            response.raise_for_status()
-            
-            data = response.json()
-            views = data.get("views", {}).get("view", [])
-            
-            # Ensure views is always a list
-            if isinstance(views, dict):
-                views = [views]
+            views = self._cached("views", workbook_id,
+                                 lambda: [view for page in self.iter_views_in_workbook(workbook_id) for view in page])
             
             logging.info(f"Retrieved {len(views)} views for workbook {workbook_id}")
             return views
             
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to get views for workbook {workbook_id}: {str(e)}")
-            raise Exception(f"Failed to retrieve dashboards: {str(e)}")
+            raise TableauAPIError(f"Failed to retrieve dashboards: {str(e)}", e)
     
-    def export_view_as_pdf(self, view_id: str) -> bytes:
+    def export_view_as_pdf(self, view_id: str, filters: Optional[Dict[str, str]] = None) -> bytes:
         """Export a view as PDF and return the content"""
         url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/views/{view_id}/pdf"
         
         try:
-            response = requests.get(url, headers=self._get_headers())
+            response = self._request("GET", url, headers=self._get_headers(), params=filter_params(filters))
             response.raise_for_status()
             
             logging.info(f"Successfully exported view {view_id} as PDF")
@@ -183,7 +542,120 @@ class TableauAPI:
             
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to export view {view_id} as PDF: {str(e)}")
-            raise Exception(f"Failed to export dashboard as PDF: {str(e)}")
+            raise TableauAPIError(f"Failed to export dashboard as PDF: {str(e)}", e)
+    
+    def _get_item(self, url: str, key: str) -> Dict:
+        """Fetch a single REST resource and return its payload under key"""
+        response = self._request("GET", url, headers=self._get_headers())
+        response.raise_for_status()
+        return response.json().get(key, {})
+    
+    def get_view(self, view_id: str) -> Dict:
+        """Get metadata (including updatedAt and workbook id) for a single view"""
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/views/{view_id}"
+        
+        try:
+            return self._cached("view", view_id, lambda: self._get_item(url, "view"))
+            
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to get view {view_id}: {str(e)}")
+            raise TableauAPIError(f"Failed to retrieve dashboard details: {str(e)}", e)
+    
+    def get_workbook(self, workbook_id: str) -> Dict:
+        """Get metadata (including updatedAt) for a single workbook"""
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/workbooks/{workbook_id}"
+        
+        try:
+            return self._cached("workbook", workbook_id, lambda: self._get_item(url, "workbook"))
+            
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to get workbook {workbook_id}: {str(e)}")
+            raise TableauAPIError(f"Failed to retrieve workbook details: {str(e)}", e)
+    
+    def _stream_to(self, url: str, destination: Union[str, BinaryIO], max_bytes: Optional[int] = None,
+                   params: Optional[Dict] = None, view_id: Optional[str] = None) -> int:
+        """Stream a response body into a path or writable file object; returns bytes written.
+
+        Emits "download" stage events (start, byte progress, end) for view_id."""
+        max_bytes = MAX_EXPORT_BYTES if max_bytes is None else max_bytes
+        
+        # Renders are expensive server-side, so hold a per-site slot for the whole download
+        with self.scheduler.render_slot(), instrumentation.stage("download", view_id=view_id) as event, \
+                self._request("GET", url, headers=self._get_headers(), params=params, stream=True) as response:
+            response.raise_for_status()
+            
+            declared = int(response.headers.get("Content-Length") or 0)
+            if max_bytes and declared > max_bytes:
+                raise Exception(f"Export is {declared} bytes, above the {max_bytes} byte limit")
+            
+            # Write paths through a temporary name so readers never see a partial file
+            if isinstance(destination, str):
+                part_path = f"{destination}.part"
+                target = open(part_path, "wb")
+            else:
+                part_path = None
+                target = destination
+            
+            written = 0
+            reported = time.perf_counter()
+            try:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    written += len(chunk)
+                    if max_bytes and written > max_bytes:
+                        raise Exception(f"Export exceeded the {max_bytes} byte limit")
+                    target.write(chunk)
+                    if time.perf_counter() - reported >= DOWNLOAD_PROGRESS_INTERVAL:
+                        reported = time.perf_counter()
+                        instrumentation.emit("download", state="progress", view_id=view_id, bytes=written,
+                                             total=declared or None)
+            except BaseException:
+                if part_path:
+                    target.close()
+                    os.remove(part_path)
+                raise
+            
+            if part_path:
+                target.close()
+                os.replace(part_path, destination)
+            
+            event["bytes"] = written
+            return written
+    
+    def export_view_to_file(self, view_id: str, destination: Union[str, BinaryIO],
+                            max_bytes: Optional[int] = None, filters: Optional[Dict[str, str]] = None) -> int:
+        """Stream a view's PDF export to a path or file object and return the byte count"""
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/views/{view_id}/pdf"
+        
+        try:
+            written = self._stream_to(url, destination, max_bytes=max_bytes, params=filter_params(filters),
+                                      view_id=view_id)
+            
+            logging.info(f"Successfully exported view {view_id} as PDF ({written} bytes)")
+            return written
+            
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to export view {view_id} as PDF: {str(e)}")
+            raise TableauAPIError(f"Failed to export dashboard as PDF: {str(e)}", e)
+    
+    def export_view_image_to_file(self, view_id: str, destination: Union[str, BinaryIO],
+                                  resolution: str = "high", max_age: Optional[int] = None,
+                                  max_bytes: Optional[int] = None, filters: Optional[Dict[str, str]] = None) -> int:
+        """Stream a server-rendered PNG of a view to a path or file object and return the byte count"""
+        url = f"{self.server_url}/api/{self.api_version}/sites/{self.site_id_response}/views/{view_id}/image"
+        params = filter_params(filters)
+        params["resolution"] = resolution
+        if max_age is not None:
+            params["maxAge"] = max_age
+        
+        try:
+            written = self._stream_to(url, destination, max_bytes=max_bytes, params=params, view_id=view_id)
+            
+            logging.info(f"Successfully exported view {view_id} as image ({written} bytes)")
+            return written
+            
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to export view {view_id} as image: {str(e)}")
+            raise TableauAPIError(f"Failed to export dashboard as image: {str(e)}", e)
     
     def sign_out(self):
         """Sign out and invalidate the authentication token"""
@@ -193,7 +665,7 @@ class TableauAPI:
         url = f"{self.server_url}/api/{self.api_version}/auth/signout"
         
         try:
-            response = requests.post(url, headers=self._get_headers())
+            response = self._request("POST", url, headers=self._get_headers())
             response.raise_for_status()
             logging.info("Successfully signed out")
             